@@ -5,6 +5,8 @@ import numpy as np
 import time
 from datetime import datetime
 
+from pipeline import FramePipeline
+
 # ---------------------------
 # Page config
 # ---------------------------
@@ -138,25 +140,24 @@ def live_page():
             st.session_state.mode = None
         st.markdown("</div>", unsafe_allow_html=True)
 
-    # Webcam feed
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
+    # Webcam feed (capture runs on its own thread; only the newest frame is shown)
+    pipe = FramePipeline(0)
+    if not pipe.start():
         video_frame.error("Cannot access webcam. Ensure no other app is using it.")
         st.session_state.running = False
         return
 
+    def present(item):
+        _, _, frame, _ = item
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        video_frame.image(frame_rgb, use_column_width=True)
+        st.session_state.last_checked = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
     try:
-        while st.session_state.running:
-            ret, frame = cap.read()
-            if not ret:
-                video_frame.error("Cannot read webcam feed.")
-                break
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            video_frame.image(frame_rgb, use_column_width=True)
-            st.session_state.last_checked = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            time.sleep(0.03)
+        pipe.run(present, keep_running=lambda: st.session_state.running)
+        if pipe.error and st.session_state.running:
+            video_frame.error("Cannot read webcam feed.")
     finally:
-        cap.release()
         video_frame.image(black_placeholder(), caption="Stream stopped", use_column_width=True)
         st.session_state.running = False
 
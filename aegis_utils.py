@@ -1,9 +1,16 @@
 # aegis_utils.py
 import os
+import sys
 import cv2
 import time
 import json
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing
 from collections import deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 def save_frames_as_video(frames, out_path, fps=15):
     """Save list of BGR frames as mp4 file. Returns True if success."""
@@ -22,15 +29,246 @@ def ensure_dir(path):
     if d and not os.path.exists(d):
         os.makedirs(d, exist_ok=True)
 
+_name_lock = threading.Lock()
+_last_name = [None, 0]
+
 def safe_timestamp_name(prefix="aegis"):
-    ts = int(time.time())
-    return f"{prefix}_{ts}"
+    """<prefix>_<unix_ts>_<ms>, with a _<n> suffix if called again within the same millisecond."""
+    now = time.time()
+    base = f"{prefix}_{int(now)}_{int(now * 1000) % 1000:03d}"
+    with _name_lock:
+        if _last_name[0] == base:
+            _last_name[1] += 1
+            return f"{base}_{_last_name[1]}"
+        _last_name[0], _last_name[1] = base, 0
+    return base
+
+# ------------------------------
+# Configuration
+# ------------------------------
+DEFAULT_CONFIG = {
+    "fire_model": "models/fire.pt",
+    "violence_model": "models/Violence.pt",
+    "home_model": "yolov8n.pt",
+    "backend": "torch",
+    "camera_index": 0,
+    "preload": True,
+    "target_fps": 0.0,      # > 0 enables the per-camera input-size autoscaler
+    "shared_preprocess": True,  # public mode: one letterbox / tensor / NMS pass for both models (torch)
+    "stream_bind": "127.0.0.1",  # interface the MJPEG server listens on (0.0.0.0 = every interface)
+}
+
+def load_config(path=None):
+    """
+    DEFAULT_CONFIG, overlaid by a JSON file (path, else $AEGIS_CONFIG, else ./aegis.json
+    if present) and then by AEGIS_<KEY> environment variables, e.g. AEGIS_FIRE_MODEL.
+    """
+    config = dict(DEFAULT_CONFIG)
+    path = path or os.environ.get("AEGIS_CONFIG") or "aegis.json"
+    if os.path.exists(path):
+        with open(path) as f:
+            config.update(json.load(f))
+    for key, default in DEFAULT_CONFIG.items():
+        raw = os.environ.get(f"AEGIS_{key.upper()}")
+        if raw is None:
+            continue
+        if isinstance(default, bool):
+            config[key] = raw.strip().lower() in ("1", "true", "yes", "on")
+        elif isinstance(default, int):
+            config[key] = int(raw)
+        elif isinstance(default, float):
+            config[key] = float(raw)
+        else:
+            config[key] = raw
+    return config
+
+# ------------------------------
+# Structured, non-blocking logging
+# ------------------------------
+# log_info / log_warn / log_error only format a record and drop it on a queue;
+# a background listener writes rotating JSONL files (and the console). Repeated
+# messages are deduplicated per key and each level is rate-limited, so per-frame
+# warnings cannot flood the disk or stall the frame loop.
+
+_LEVELS = {"INFO": logging.INFO, "WARN": logging.WARNING, "ERROR": logging.ERROR}
+
+
+class JsonlFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+            "level": "WARN" if record.levelno == logging.WARNING else record.levelname,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return json.dumps(entry, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        level = "WARN" if record.levelno == logging.WARNING else record.levelname
+        repeated = (getattr(record, "fields", None) or {}).get("repeated")
+        suffix = f" (repeated {repeated}x)" if repeated else ""
+        return f"[{level}] {time.ctime(record.created)} - {record.getMessage()}{suffix}"
+
+
+class _Throttle:
+    """
+    Per-key dedup window plus a per-level token bucket. The key defaults to the
+    log call site (plus the camera field, if any), so f-string messages that
+    differ only in their values are still deduplicated; call sites that log
+    distinct events pass a stable key= per subject.
+    """
+
+    def __init__(self, dedup_window=5.0, rate_per_s=50.0, burst=100):
+        self.dedup_window = dedup_window
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self._last = {}       # key -> [last_emit_time, suppressed_count]
+        self._tokens = {}     # level -> [tokens, last_refill]
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def admit(self, level, key, now):
+        """Returns None to drop, else the number of suppressed repeats to report."""
+        with self._lock:
+            seen = self._last.get(key)
+            if seen is not None and now - seen[0] < self.dedup_window:
+                seen[1] += 1
+                return None
+            tokens, last = self._tokens.get(level, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate_per_s)
+            if tokens < 1.0:
+                self._tokens[level] = (tokens, now)
+                self.dropped += 1
+                return None
+            self._tokens[level] = (tokens - 1.0, now)
+            repeated = seen[1] if seen is not None else 0
+            self._last[key] = [now, 0]
+            if len(self._last) > 4096:  # keys are usually few; don't let per-subject keys grow this forever
+                cutoff = now - self.dedup_window
+                self._last = {k: v for k, v in self._last.items() if v[0] >= cutoff}
+            return repeated
+
+
+class _EventLogger:
+    def __init__(self):
+        self._logger = None
+        self._listener = None
+        self._options = {}
+        self._forked = False
+        self._throttle = _Throttle()
+        self._lock = threading.Lock()
+
+    def configure(self, **kwargs):
+        with self._lock:
+            self._options = dict(kwargs)
+            self._configure(**kwargs)
+
+    def _after_fork(self):
+        """
+        Forked child: the parent's listener thread does not exist here and its locks may be held
+        mid-operation. Drop them; the first log call starts the child's own listener with the
+        parent's options.
+        """
+        self._lock = threading.Lock()
+        self._throttle._lock = threading.Lock()
+        self._listener = None
+        self._logger = None
+        self._forked = True
+
+    def _configure(self, log_dir="logs", filename="aegis.jsonl", max_bytes=5 * 2 ** 20, backups=5, console=True,
+                   dedup_window=5.0, rate_per_s=50.0, queue_size=10000):
+        self.shutdown()
+        os.makedirs(log_dir, exist_ok=True)
+        if self._forked or multiprocessing.parent_process() is not None:
+            # rotating one file from several processes corrupts it: child processes get their own
+            stem, ext = os.path.splitext(filename)
+            filename = f"{stem}.{os.getpid()}{ext}"
+        file_handler = RotatingFileHandler(os.path.join(log_dir, filename), maxBytes=max_bytes,
+                                           backupCount=backups, encoding="utf-8")
+        file_handler.setFormatter(JsonlFormatter())
+        handlers = [file_handler]
+        if console:
+            stream_handler = logging.StreamHandler(sys.stdout)
+            stream_handler.setFormatter(ConsoleFormatter())
+            handlers.append(stream_handler)
+
+        q = queue.Queue(maxsize=queue_size)
+        logger = logging.getLogger("aegis")
+        logger.handlers = [_NonBlockingQueueHandler(q)]
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        self._listener = QueueListener(q, *handlers, respect_handler_level=False)
+        self._listener.start()
+        self._throttle = _Throttle(dedup_window=dedup_window, rate_per_s=rate_per_s)
+        self._logger = logger
+
+    def shutdown(self):
+        """Stops the listener after flushing everything already queued."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def log(self, level, msg, key=None, **fields):
+        if self._logger is None:
+            with self._lock:
+                if self._logger is None:
+                    self._configure(**self._options)
+        if key is None:
+            caller = sys._getframe(2)  # log() <- log_info/log_warn/log_error <- call site
+            key = (caller.f_code.co_filename, caller.f_lineno, fields.get("camera"))
+        repeated = self._throttle.admit(level, key, time.time())
+        if repeated is None:
+            return
+        if repeated:
+            fields["repeated"] = repeated
+        self._logger.log(_LEVELS[level], msg, extra={"fields": fields})
+
+    @property
+    def dropped(self):
+        return self._throttle.dropped
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Never blocks the caller: if the writer falls behind, records are dropped."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # skip QueueHandler's eager message formatting; the listener formats
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+event_log = _EventLogger()
+atexit.register(event_log.shutdown)
+if hasattr(os, "register_at_fork"):  # POSIX; spawn / Windows children start fresh anyway
+    os.register_at_fork(after_in_child=event_log._after_fork)
+
+
+def configure_logging(**kwargs):
+    """
+    Optional: set log directory, rotation, console echo, dedup window and rate limit.
+    Child processes (forked or spawned) write to <name>.<pid>.jsonl next to the main file.
+    """
+    event_log.configure(**kwargs)
+
 
-def log_info(msg):
-    print(f"[INFO] {time.ctime()} - {msg}")
+def log_info(msg, key=None, **fields):
+    event_log.log("INFO", msg, key, **fields)
 
-def log_warn(msg):
-    print(f"[WARN] {time.ctime()} - {msg}")
+def log_warn(msg, key=None, **fields):
+    event_log.log("WARN", msg, key, **fields)
 
-def log_error(msg):
-    print(f"[ERROR] {time.ctime()} - {msg}")
+def log_error(msg, key=None, **fields):
+    event_log.log("ERROR", msg, key, **fields)
@@ -0,0 +1,307 @@
+# alert_store.py
+"""
+Indexed alert store.
+
+Every alert clip gets a row in an embedded SQLite index (alerts/index.db):
+camera, time range, file paths, clip size, a small JPEG thumbnail and one
+row per detection (label, conf, box, track id). Queries by time range,
+camera, label and confidence hit indexes instead of scanning alerts/.
+
+record() only resizes the thumbnail and drops a tuple on a queue; a single
+writer thread encodes thumbnails, batches inserts into one transaction,
+fills in clip sizes once the AlertWriter has finished them, and applies
+retention (max age) and size-based eviction, deleting the oldest clips first.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import cv2
+
+from aegis_utils import log_info, log_warn
+from metrics import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    camera TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    video_path TEXT,
+    screenshot_path TEXT,
+    thumbnail BLOB,
+    max_conf REAL,
+    bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS detections (
+    alert_id INTEGER NOT NULL REFERENCES alerts(id) ON DELETE CASCADE,
+    label TEXT NOT NULL,
+    conf REAL NOT NULL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+    track_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS alerts_start ON alerts(start_ts);
+CREATE INDEX IF NOT EXISTS alerts_camera_start ON alerts(camera, start_ts);
+CREATE INDEX IF NOT EXISTS detections_label_conf ON detections(label, conf);
+CREATE INDEX IF NOT EXISTS detections_alert ON detections(alert_id);
+"""
+
+_STOP = object()
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")      # readers never block the writer thread
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class AlertStore:
+    """
+    - root: directory holding clips, screenshots and index.db
+    - retention_days: delete alerts (rows and files) older than this; None = keep
+    - max_bytes: evict oldest clips once their total size exceeds this; None = unbounded
+    - thumb_width: thumbnail width in pixels (JPEG, stored in the index)
+    - batch_size / flush_interval: inserts are committed in batches of up to
+      batch_size, at least every flush_interval seconds
+    - max_queue: records allowed to wait for the writer; beyond that they are dropped (and counted)
+    """
+
+    def __init__(self, root="alerts", retention_days=None, max_bytes=None, thumb_width=160,
+                 batch_size=64, flush_interval=1.0, evict_interval=60.0, max_queue=1024):
+        self.root = root
+        self.db_path = os.path.join(root, "index.db")
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.thumb_width = thumb_width
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.evict_interval = evict_interval
+        self.recorded = 0
+        self.dropped = 0
+        self.evicted = 0
+        os.makedirs(root, exist_ok=True)
+        conn = _connect(self.db_path)
+        conn.executescript(SCHEMA)
+        conn.close()
+        self._queue = queue.Queue(max_queue)
+        self._local = threading.local()
+        self._sizing = []           # (name, AlertJob, paths) whose size is not indexed yet
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = threading.Thread(target=self._writer_loop, name="aegis-alert-store", daemon=True)
+        self._thread.start()
+
+    # frame-loop side ---------------------------------------------------
+    def path_for(self, name, ext):
+        return os.path.join(self.root, f"{name}.{ext}")
+
+    def record(self, name, camera, start_ts, end_ts, detections, video_path, screenshot_path=None,
+               frame=None, track_ids=None, job=None):
+        """
+        Queues one alert for indexing; never blocks. frame (optional) is downscaled
+        here into a thumbnail, so the caller may reuse its buffer right away.
+        job: the AlertJob writing the clip; its size is indexed once it finishes.
+        """
+        thumb = None
+        if frame is not None and frame.ndim == 3:
+            h, w = frame.shape[:2]
+            tw = min(self.thumb_width, w)
+            thumb = cv2.resize(frame, (tw, max(1, h * tw // w)), interpolation=cv2.INTER_AREA)
+        dets = [(lbl, float(c), *map(int, b), int(t) if t is not None else None)
+                for lbl, c, b, t in zip(detections.labels, detections.confs, detections.boxes.tolist(),
+                                        track_ids if track_ids is not None else [None] * len(detections))]
+        row = (name, camera, float(start_ts), float(end_ts), video_path, screenshot_path, thumb, dets, job)
+        try:
+            self._queue.put_nowait(row)
+            self._idle.clear()
+        except queue.Full:
+            self.dropped += 1
+            log_warn(f"Alert store queue full; {name} not indexed", key="alert_store_full")
+
+    # writer thread -----------------------------------------------------
+    def _writer_loop(self):
+        conn = _connect(self.db_path)
+        next_evict = 0.0
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if any(item is _STOP for item in batch):
+                batch = [item for item in batch if item is not _STOP]
+                stopping = True
+            try:
+                if batch:
+                    with metrics.timer("alert_index"):
+                        self._insert(conn, batch)
+                self._update_sizes(conn, final=stopping)
+                now = time.time()
+                if now >= next_evict or stopping:
+                    self._evict(conn)
+                    next_evict = now + self.evict_interval
+            except sqlite3.Error as e:
+                log_warn(f"Alert index write failed: {e}", key="alert_store_error")
+            if self._queue.empty():
+                self._idle.set()
+        conn.close()
+
+    def _insert(self, conn, batch):
+        with conn:
+            for name, camera, start_ts, end_ts, video_path, screenshot_path, thumb, dets, job in batch:
+                blob = None
+                if thumb is not None:
+                    ok, buf = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, 70])
+                    blob = buf.tobytes() if ok else None
+                max_conf = max((d[1] for d in dets), default=None)
+                cur = conn.execute(
+                    "INSERT INTO alerts (name, camera, start_ts, end_ts, video_path, screenshot_path,"
+                    " thumbnail, max_conf, bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+                    (name, camera, start_ts, end_ts, video_path, screenshot_path, blob, max_conf))
+                alert_id = cur.lastrowid
+                conn.executemany("INSERT INTO detections (alert_id, label, conf, x1, y1, x2, y2, track_id)"
+                                 " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(alert_id,) + d for d in dets])
+                if job is not None or video_path:
+                    self._sizing.append((name, job, video_path, screenshot_path))
+        self.recorded += len(batch)
+
+    def _update_sizes(self, conn, final=False):
+        """Fills in clip sizes for alerts whose AlertJob has finished (or was dropped)."""
+        still, done = [], []
+        for item in self._sizing:
+            name, job, video_path, screenshot_path = item
+            if job is not None and not job.done() and not final:
+                still.append(item)
+                continue
+            size = sum(os.path.getsize(p) for p in (video_path, screenshot_path) if p and os.path.exists(p))
+            done.append((size, name))
+        self._sizing = still
+        if done:
+            with conn:
+                conn.executemany("UPDATE alerts SET bytes = ? WHERE name = ?", done)
+
+    def _delete(self, conn, rows):
+        for _, video_path, screenshot_path in rows:
+            for p in (video_path, screenshot_path):
+                if p and os.path.exists(p):
+                    try:
+                        os.remove(p)
+                    except OSError as e:
+                        log_warn(f"Could not remove {p}: {e}")
+        with conn:
+            conn.executemany("DELETE FROM alerts WHERE id = ?", [(r[0],) for r in rows])
+        self.evicted += len(rows)
+
+    def _evict(self, conn):
+        if self.retention_days is not None:
+            cutoff = time.time() - self.retention_days * 86400.0
+            rows = conn.execute("SELECT id, video_path, screenshot_path FROM alerts WHERE start_ts < ?",
+                                (cutoff,)).fetchall()
+            if rows:
+                self._delete(conn, rows)
+                log_info(f"Alert retention removed {len(rows)} alert(s) older than {self.retention_days} days")
+        if self.max_bytes is not None:
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM alerts").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for alert_id, video_path, screenshot_path, size in conn.execute(
+                    "SELECT id, video_path, screenshot_path, bytes FROM alerts WHERE bytes IS NOT NULL"
+                    " ORDER BY start_ts"):
+                if total <= self.max_bytes:
+                    break
+                victims.append((alert_id, video_path, screenshot_path))
+                total -= size
+            if victims:
+                self._delete(conn, victims)
+                log_info(f"Alert size cap evicted {len(victims)} oldest alert(s)")
+
+    # query side (any thread) -------------------------------------------
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def query(self, start=None, end=None, camera=None, label=None, min_conf=None, limit=100):
+        """
+        Alerts overlapping [start, end], newest first, as dicts (without thumbnail bytes).
+        label / min_conf select alerts having at least one matching detection.
+        """
+        where, args = [], []
+        if start is not None:
+            where.append("a.end_ts >= ?")
+            args.append(start)
+        if end is not None:
+            where.append("a.start_ts <= ?")
+            args.append(end)
+        if camera is not None:
+            where.append("a.camera = ?")
+            args.append(camera)
+        if label is not None or min_conf is not None:
+            sub, sub_args = ["d.alert_id = a.id"], []
+            if label is not None:
+                sub.append("d.label = ?")
+                sub_args.append(label)
+            if min_conf is not None:
+                sub.append("d.conf >= ?")
+                sub_args.append(min_conf)
+            where.append(f"EXISTS (SELECT 1 FROM detections d WHERE {' AND '.join(sub)})")
+            args.extend(sub_args)
+        sql = ("SELECT a.id, a.name, a.camera, a.start_ts, a.end_ts, a.video_path, a.screenshot_path,"
+               " a.max_conf, a.bytes FROM alerts a")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY a.start_ts DESC LIMIT ?"
+        args.append(int(limit))
+        return [dict(r) for r in self._reader().execute(sql, args)]
+
+    def detections(self, alert_id):
+        rows = self._reader().execute("SELECT label, conf, x1, y1, x2, y2, track_id FROM detections"
+                                      " WHERE alert_id = ? ORDER BY conf DESC", (alert_id,))
+        return [{"label": r["label"], "conf": r["conf"], "box": [r["x1"], r["y1"], r["x2"], r["y2"]],
+                 "track_id": r["track_id"]} for r in rows]
+
+    def thumbnail(self, alert_id):
+        """JPEG bytes of the alert's thumbnail, or None."""
+        row = self._reader().execute("SELECT thumbnail FROM alerts WHERE id = ?", (alert_id,)).fetchone()
+        return row[0] if row else None
+
+    def flush(self, timeout=None):
+        """Waits until everything recorded so far is committed (tests / shutdown only)."""
+        return self._idle.wait(timeout)
+
+    def stats(self):
+        return {"recorded": self.recorded, "dropped": self.dropped, "evicted": self.evicted,
+                "queued": self._queue.qsize()}
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        log_info(f"Alert store closed (recorded={self.recorded}, dropped={self.dropped}, evicted={self.evicted})")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(root="alerts", **kwargs):
+    """Process-wide alert store, created on first use and shared by all sessions."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AlertStore(root, **kwargs)
+        return _store
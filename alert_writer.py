@@ -0,0 +1,154 @@
+# alert_writer.py
+"""
+Background alert clip encoder.
+
+submit() returns immediately with an AlertJob handle; the clip (pre-trigger
+frames + optional post-trigger frames) and screenshot are written by a worker
+pool so the detection loop never waits on VideoWriter or disk I/O. A writer
+may be shared by several cameras: jobs collecting post-trigger frames are
+keyed by source, and feed() only extends the jobs of the source it is given.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from aegis_utils import save_frames_as_video, ensure_dir, log_info, log_warn
+from metrics import metrics
+
+
+def _decode(frame):
+    # JPEG-compressed ring buffer slots arrive as 1-D encoded buffers
+    if frame.ndim == 1:
+        return cv2.imdecode(frame, cv2.IMREAD_COLOR)
+    return frame
+
+
+class AlertJob:
+    """Handle for one queued alert. future resolves to True if the clip was written."""
+
+    def __init__(self, frames, video_path, screenshot_path, fps, post_frames, source=None):
+        self.source = source
+        self.frames = list(frames)
+        self.pre_count = len(self.frames)
+        self.video_path = video_path
+        self.screenshot_path = screenshot_path
+        self.fps = fps
+        self.post_frames_needed = post_frames
+        self.future = None
+
+    @property
+    def collecting(self):
+        return self.post_frames_needed > 0
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def result(self, timeout=None):
+        """Blocks until written; not meant to be called from the frame loop."""
+        if self.future is None:
+            return None
+        return self.future.result(timeout=timeout)
+
+
+class AlertWriter:
+    """
+    - workers: encode threads (VideoWriter releases the GIL while encoding)
+    - max_pending: jobs allowed to be queued or encoding at once; beyond that
+      new alerts are dropped (and counted) instead of stalling the caller
+    """
+
+    def __init__(self, workers=1, max_pending=4):
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aegis-alert")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._collecting = {}  # source -> jobs still waiting for post-trigger frames
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, frames, video_path, screenshot_path=None, fps=15, post_frames=0, source=None):
+        """
+        frames: pre-trigger frames; must not be mutated afterwards (pass a snapshot)
+        post_frames: number of subsequent frames fed via feed() to append before encoding
+        source: camera the alert belongs to; only feed(frame, source) frames are appended
+        Returns an AlertJob, or None if the writer is saturated and the alert was dropped.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                log_warn(f"Alert writer saturated ({self._pending} pending); dropping {video_path}")
+                return None
+            self._pending += 1
+        job = AlertJob(frames, video_path, screenshot_path, fps, post_frames, source)
+        if job.collecting:
+            with self._lock:
+                self._collecting.setdefault(source, []).append(job)
+        else:
+            self._dispatch(job)
+        return job
+
+    def feed(self, frame, source=None):
+        """Offers a new frame of `source` to its jobs still collecting post-trigger frames. Cheap when none are."""
+        if source not in self._collecting:
+            return
+        with self._lock:
+            jobs = self._collecting.pop(source, [])
+        copy = frame.copy()
+        still = []
+        for job in jobs:
+            job.frames.append(copy)
+            job.post_frames_needed -= 1
+            if job.collecting:
+                still.append(job)
+            else:
+                self._dispatch(job)
+        if still:
+            with self._lock:
+                # jobs submitted while this frame was being handed out come after the older ones
+                self._collecting[source] = still + self._collecting.get(source, [])
+
+    def _dispatch(self, job):
+        job.future = self._pool.submit(self._write, job)
+        job.future.add_done_callback(self._on_done)
+
+    def _write(self, job):
+        with metrics.timer("alert_write"):
+            return self._write_files(job)
+
+    def _write_files(self, job):
+        frames = [_decode(f) for f in job.frames]
+        ensure_dir(job.video_path)
+        saved = save_frames_as_video(frames, job.video_path, fps=job.fps)
+        if job.screenshot_path and frames:
+            ensure_dir(job.screenshot_path)
+            # screenshot is the last pre-trigger frame
+            cv2.imwrite(job.screenshot_path, frames[max(job.pre_count - 1, 0)])
+        job.frames = []
+        return saved
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.exception() is None and future.result():
+                self.written += 1
+            else:
+                self.failed += 1
+        if future.exception() is not None:
+            log_warn(f"Alert write failed: {future.exception()}")
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def close(self, wait=True):
+        """Encodes any jobs still collecting with what they have, then stops the pool."""
+        with self._lock:
+            jobs = [job for per_source in self._collecting.values() for job in per_source]
+            self._collecting = {}
+        for job in jobs:
+            job.post_frames_needed = 0
+            self._dispatch(job)
+        self._pool.shutdown(wait=wait)
+        log_info(f"Alert writer closed (written={self.written}, failed={self.failed}, dropped={self.dropped})")
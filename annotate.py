@@ -0,0 +1,102 @@
+# annotate.py
+"""
+Optional render step for detections.
+
+Detectors return raw Detections; callers that actually show or save a frame
+run an Annotator over it. render_into() draws on a small set of reusable
+output buffers instead of allocating a full-frame copy each time, and label
+text is rasterized once per distinct string and then blitted. The class label
+and the confidence are cached as separate strings, so a handful of labels and
+at most 101 confidence values cover every caption.
+"""
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from metrics import metrics
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+
+# label prefix -> BGR colour
+COLORS = {"fire": (0, 0, 255), "violence": (0, 165, 255)}  # red for fire, orange for violence
+DEFAULT_COLOR = (0, 0, 255)
+
+
+def color_for(label):
+    prefix = label.split(":", 1)[0]
+    return COLORS.get(prefix, DEFAULT_COLOR)
+
+
+class Annotator:
+    """
+    - buffers: reusable output buffers rotated by render_into(); 2 lets one frame
+      be encoded / displayed while the next is drawn
+    - text_cache: how many rasterized label strings to keep
+    """
+
+    def __init__(self, buffers=2, text_cache=512, camera=None):
+        self.camera = camera
+        self._buffers = [None] * max(1, buffers)
+        self._next = 0
+        self._text = OrderedDict()
+        self._text_cache = text_cache
+
+    def _text_mask(self, text):
+        mask = self._text.get(text)
+        if mask is not None:
+            self._text.move_to_end(text)
+            return mask
+        (w, h), baseline = cv2.getTextSize(text, FONT, FONT_SCALE, 1)
+        canvas = np.zeros((h + baseline, w), dtype=np.uint8)
+        cv2.putText(canvas, text, (0, h), FONT, FONT_SCALE, 255, 1, cv2.LINE_AA)
+        mask = (canvas, h)
+        self._text[text] = mask
+        if len(self._text) > self._text_cache:
+            self._text.popitem(last=False)
+        return mask
+
+    def _blit_text(self, img, text, x, y, color):
+        """
+        Blends a cached text mask so its baseline sits at (x, y), clipped to the image.
+        Returns the text's advance width, where a following string starts.
+        """
+        canvas, ascent = self._text_mask(text)
+        top = y - ascent
+        H, W = img.shape[:2]
+        y0, x0 = max(top, 0), max(x, 0)
+        y1, x1 = min(top + canvas.shape[0], H), min(x + canvas.shape[1], W)
+        if y1 <= y0 or x1 <= x0:
+            return canvas.shape[1]
+        alpha = canvas[y0 - top:y1 - top, x0 - x:x1 - x, None].astype(np.float32) / 255.0
+        roi = img[y0:y1, x0:x1]
+        roi[:] = (roi * (1.0 - alpha) + np.asarray(color, dtype=np.float32) * alpha).astype(np.uint8)
+        return canvas.shape[1]
+
+    def draw(self, img, detections):
+        """Draws detections onto img in place and returns it."""
+        with metrics.timer("annotate", self.camera):
+            for label, conf, (x1, y1, x2, y2) in zip(detections.labels, detections.confs, detections.boxes.tolist()):
+                color = color_for(label)
+                cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+                # label and confidence are cached separately: "person " + "0.87"
+                advance = self._blit_text(img, f"{label} ", x1, y1 - 6, color)
+                self._blit_text(img, f"{conf:.2f}", x1 + advance, y1 - 6, color)
+        return img
+
+    def render(self, frame, detections):
+        """Returns a new annotated copy of frame (frame is untouched)."""
+        return self.draw(frame.copy(), detections)
+
+    def render_into(self, frame, detections):
+        """
+        Annotated copy in one of the reusable buffers. The result stays valid
+        until `buffers` further render_into() calls.
+        """
+        buf = self._buffers[self._next]
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = self._buffers[self._next] = np.empty_like(frame)
+        self._next = (self._next + 1) % len(self._buffers)
+        np.copyto(buf, frame)
+        return self.draw(buf, detections)
@@ -1,14 +1,22 @@
 # app.py
+import time
+_script_t0 = time.perf_counter()  # time to first page render is measured from here
+
 import streamlit as st
-import cv2
 import numpy as np
+import os
 import threading
-import time
-from PIL import Image
 
-import public_security
-import home_security
+# detectors (and with them ultralytics / torch) are imported on first use or by
+# the background preload below, never on the page-render path
 import aegis_utils as utils
+import pipeline
+import model_registry
+import mjpeg_server
+import alert_store
+from metrics import metrics, start_http_server
+
+CONFIG = utils.load_config()
 
 # ------------------------------
 # Page configuration
@@ -93,11 +101,68 @@ with col2:
     if st.button("Home Guardian", key="home_card"):
         st.session_state.mode_selected = "Home"
 
+# ------------------------------
+# Background preload: torch / ultralytics import while the user picks a mode,
+# then the chosen mode's weights, so Start does not wait on either
+# ------------------------------
+PUBLIC_IMGSZ, HOME_IMGSZ = 640, 320
+
+def autoscaler():
+    """Per-run input-size controller when a target FPS is configured, else None."""
+    if not CONFIG["target_fps"]:
+        return None
+    from autoscaler import LatencyAutoscaler
+    return LatencyAutoscaler(target_fps=CONFIG["target_fps"], strides=(1, 2, 3))
+
+def scale_caption(status):
+    return f" | imgsz {status['imgsz']} (stride {status['stride']})" if status else ""
+
+def preload(mode):
+    if not CONFIG["preload"]:
+        return
+    from backends import export_model
+    registry = model_registry.get_registry()
+    registry.preload_async(imports=("ultralytics",))
+    if mode == "Public":
+        registry.preload_async(CONFIG["fire_model"], CONFIG["violence_model"],
+                               resolve=lambda p: export_model(p, CONFIG["backend"], imgsz=PUBLIC_IMGSZ))
+    elif mode == "Home":
+        registry.preload_async(CONFIG["home_model"],
+                               resolve=lambda p: export_model(p, CONFIG["backend"], imgsz=HOME_IMGSZ))
+
+# ------------------------------
+# Latency metrics (sidebar toggle + local Prometheus endpoint)
+# ------------------------------
+METRICS_PORT = 9108
+metrics.enable(st.sidebar.checkbox("Latency metrics", value=metrics.enabled))
+if metrics.enabled:
+    start_http_server(METRICS_PORT)
+    st.sidebar.caption(f"Prometheus: http://127.0.0.1:{METRICS_PORT}/metrics")
+
+# ------------------------------
+# Alert index (SQLite under alerts/; retention / size cap from the environment)
+# ------------------------------
+ALERT_RETENTION_DAYS = float(os.environ["AEGIS_ALERT_RETENTION_DAYS"]) if os.environ.get("AEGIS_ALERT_RETENTION_DAYS") else None
+ALERT_MAX_MB = float(os.environ["AEGIS_ALERT_MAX_MB"]) if os.environ.get("AEGIS_ALERT_MAX_MB") else None
+alerts = alert_store.get_store("alerts", retention_days=ALERT_RETENTION_DAYS,
+                               max_bytes=int(ALERT_MAX_MB * 1024 * 1024) if ALERT_MAX_MB else None)
+with st.sidebar.expander("Recent alerts"):
+    alert_label = st.text_input("Label", value="", key="alert_label")
+    alert_conf = st.slider("Min confidence", 0.0, 1.0, 0.0, 0.05, key="alert_conf")
+    for a in alerts.query(label=alert_label or None, min_conf=alert_conf or None, limit=10):
+        thumb = alerts.thumbnail(a["id"])
+        if thumb:
+            st.image(thumb, caption=f"{a['camera']} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(a['start_ts']))}"
+                                    f" ({a['max_conf'] or 0:.2f})")
+        st.caption(a["video_path"] or a["name"])
+
 # ------------------------------
 # Video and logs placeholders
 # ------------------------------
 video_display = st.empty()
 alert_display = st.empty()
+stats_display = st.empty()
+metrics_panel = st.sidebar.empty()
 
 # show placeholder if not running
 if not st.session_state.running:
@@ -107,70 +172,136 @@ if not st.session_state.running:
 # ------------------------------
 # Functions to run modes
 # ------------------------------
-CAMERA_INDEX = 0  # webcam
+CAMERA_INDEX = CONFIG["camera_index"]  # webcam
+# video goes to the browser as a shared MJPEG stream rather than per-frame st.image pushes
+STREAM_PORT = 8765
+STREAM_HOST = os.environ.get("AEGIS_STREAM_HOST", "localhost")  # host the browser uses to reach the stream
+DISPLAY_FPS = 15
+
+def attach_stream(name):
+    server = mjpeg_server.get_server(port=STREAM_PORT, host=CONFIG["stream_bind"], max_fps=DISPLAY_FPS)
+    video_display.markdown(f"<img src='{server.url(name, STREAM_HOST)}' style='width:100%;border-radius:8px;'>",
+                           unsafe_allow_html=True)
+    return server.stream(name)
+
+_last_panel_update = [0.0]
+
+def first_result_timer(mode):
+    """Returns mark(): the first call records seconds from Start to the first processed frame."""
+    t0 = time.perf_counter()
+    seen = []
+
+    def mark():
+        if not seen:
+            seen.append(time.perf_counter() - t0)
+            metrics.observe("first_detection", seen[0], camera=mode)
+            utils.log_info(f"{mode}: first detection result {seen[0]:.2f}s after Start", camera=mode,
+                           startup_s=seen[0])
+        return seen[0]
+    return mark
+
+def show_stage_stats(pipe, extra=""):
+    stats = pipe.report()
+    stats_display.caption(" | ".join(
+        f"{name}: {s['fps']:.1f} FPS ({s['avg_ms']:.0f} ms)" + (f", dropped {s['dropped']}" if "dropped" in s else "")
+        for name, s in stats.items()
+    ) + extra)
+    # live per-stage latency table, refreshed about once a second
+    if metrics.enabled and time.time() - _last_panel_update[0] >= 1.0:
+        _last_panel_update[0] = time.time()
+        metrics_panel.dataframe(metrics.snapshot(), use_container_width=True)
 
 def run_public():
+    first_result = first_result_timer("public")
     try:
-        ps = public_security.PublicSecurity(
-            fire_model_path=r"C:\Users\TNZ\PycharmProjects\Aegis\fire.pt",
-            violence_model_path=r"C:\Users\TNZ\PycharmProjects\Aegis\Violence.pt"
+        from public_security import PublicSecurity
+        from cadence import ModelCadence
+        ps = PublicSecurity(
+            fire_model_path=CONFIG["fire_model"],
+            violence_model_path=CONFIG["violence_model"],
+            imgsz=PUBLIC_IMGSZ,
+            # fire develops over seconds; violence keeps full frame-rate sampling
+            cadence={"fire": ModelCadence(hz=2, boost_hz=10)},
+            registry=model_registry.get_registry(),
+            backend=CONFIG["backend"],
+            autoscale=autoscaler(),
+            # parity with predict() is covered by tests/test_preprocess.py; other backends ignore it
+            shared_preprocess=CONFIG["shared_preprocess"]
         )
     except Exception as e:
         alert_display.error(f"Failed to load models: {e}")
         st.session_state.running = False
         return
 
-    cap = cv2.VideoCapture(CAMERA_INDEX)
-    if not cap.isOpened():
-        alert_display.error("Cannot open camera.")
+    pipe = pipeline.FramePipeline(CAMERA_INDEX, infer_fn=ps.infer_frame, camera=ps.camera)
+    stream = attach_stream("public")
+    if not pipe.start():
+        alert_display.error(pipe.error)
         st.session_state.running = False
+        ps.close()
         return
 
-    while st.session_state.running:
-        ret, frame = cap.read()
-        if not ret:
-            alert_display.error("Camera frame not available.")
-            break
-        annotated, detections = ps.infer_frame(frame)
-        img = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-        video_display.image(img, use_column_width=True)
+    def present(item):
+        _, _, frame, (_, detections) = item
+        startup_s = first_result()
+        # only draw frames the stream will actually show; two reusable buffers
+        # let one frame be encoded while the next is drawn
+        if stream.ready():
+            with metrics.timer("display", pipe.camera):
+                stream.publish(ps.annotator.render_into(frame, detections))
         if detections:
-            alert_display.info(", ".join([f"{d['label']} ({d['conf']:.2f})" for d in detections]))
+            # "*" marks detections carried over from a model's previous run
+            alert_display.info(", ".join([f"{d['label']} ({d['conf']:.2f}){'' if d['fresh'] else '*'}"
+                                          for d in detections]))
         else:
             alert_display.empty()
-        time.sleep(0.03)
-    cap.release()
+        show_stage_stats(pipe, f" | first detection: {startup_s:.1f}s" + scale_caption(ps.scale_status))
+
+    pipe.run(present, keep_running=lambda: st.session_state.running)
+    if pipe.error and st.session_state.running:
+        alert_display.error(pipe.error)
+    ps.close()
 
 def run_home():
+    first_result = first_result_timer("home")
     try:
-        hs = home_security.HomeSecurity(model_path="yolov8n.pt")
+        from home_security import HomeSecurity
+        hs = HomeSecurity(model_path=CONFIG["home_model"], imgsz=HOME_IMGSZ, motion_gate=True,
+                          registry=model_registry.get_registry(), backend=CONFIG["backend"], alert_store=alerts,
+                          autoscale=autoscaler())
     except Exception as e:
         alert_display.error(f"Failed to load home model: {e}")
         st.session_state.running = False
         return
 
-    cap = cv2.VideoCapture(CAMERA_INDEX)
-    if not cap.isOpened():
-        alert_display.error("Cannot open camera.")
+    # every captured frame goes to the alert pre-roll, not only the ones the inference stage gets to
+    pipe = pipeline.FramePipeline(CAMERA_INDEX, infer_fn=hs.process_frame, camera=hs.camera, on_capture=hs.capture)
+    stream = attach_stream("home")
+    if not pipe.start():
+        alert_display.error(pipe.error)
         st.session_state.running = False
+        hs.close()
         return
 
-    while st.session_state.running:
-        ret, frame = cap.read()
-        if not ret:
-            alert_display.error("Camera frame not available.")
-            break
-        annotated, detections, info = hs.process_frame(frame)
-        img = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-        video_display.image(img, use_column_width=True)
+    def present(item):
+        _, _, frame, (_, detections, info) = item
+        startup_s = first_result()
+        if stream.ready():
+            with metrics.timer("display", pipe.camera):
+                stream.publish(hs.annotator.render_into(frame, detections))
         if detections:
             alert_display.info(", ".join([f"{d['label']} ({d['conf']:.2f})" for d in detections]))
         else:
             alert_display.empty()
         if info.get("triggered"):
             alert_display.warning(f"⚠️ ALERT: Threat detected! Saved video and screenshot in /alerts/")
-        time.sleep(0.03)
-    cap.release()
+        show_stage_stats(pipe, f" | motion-skipped: {hs.motion_gate.stats()['skip_ratio']:.0%}"
+                               f" | first detection: {startup_s:.1f}s" + scale_caption(info.get("scale")))
+
+    pipe.run(present, keep_running=lambda: st.session_state.running)
+    if pipe.error and st.session_state.running:
+        alert_display.error(pipe.error)
+    hs.close()
 
 # ------------------------------
 # Start / Stop buttons
@@ -192,3 +323,15 @@ with col_stop:
     if st.button("Stop", key="stop_btn", help="Stop security system", use_container_width=True):
         st.session_state.running = False
         alert_display.info("System stopped.")
+
+# ------------------------------
+# Cold start: preload once the page is on screen; time to first render is
+# reported separately from time to first detection (see first_result_timer)
+# ------------------------------
+preload(st.session_state.mode_selected)
+if "first_render_s" not in st.session_state:
+    st.session_state.first_render_s = time.perf_counter() - _script_t0
+    metrics.observe("first_render", st.session_state.first_render_s)
+    utils.log_info(f"First page render in {st.session_state.first_render_s:.2f}s",
+                   startup_s=st.session_state.first_render_s)
+st.sidebar.caption(f"Page ready in {st.session_state.first_render_s:.2f}s")
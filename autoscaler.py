@@ -0,0 +1,132 @@
+# autoscaler.py
+"""
+Per-camera, latency-driven input-size controller.
+
+Each detector owns one LatencyAutoscaler. After every inference call it is
+fed the measured latency; when the smoothed per-frame cost stays above the
+frame budget (1 / target_fps) it steps down a ladder of input sizes (and,
+past the smallest size, optional frame strides), and when a larger rung is
+predicted to fit comfortably it steps back up. Different up / down margins,
+a patience count and a cooldown after every change keep it from flapping.
+
+    scaler = LatencyAutoscaler(target_fps=10)            # ladder derived from the detector's imgsz
+    hs = HomeSecurity(..., autoscale=scaler)
+    ... info["scale"] -> {"imgsz": 416, "stride": 1, ...}
+"""
+from aegis_utils import log_info
+
+
+def default_ladder(imgsz, floor=160):
+    """Input sizes from imgsz down to about 40% of it, multiples of 32 (YOLO stride)."""
+    sizes = []
+    for f in (1.0, 0.8, 0.65, 0.5, 0.4):
+        s = max(floor, int(round(imgsz * f / 32.0)) * 32)
+        if s not in sizes:
+            sizes.append(s)
+    return sizes
+
+
+class LatencyAutoscaler:
+    """
+    - target_fps: frame rate the camera should sustain; budget per frame = 1 / target_fps
+    - sizes: input sizes, largest first (None = default_ladder of the detector's imgsz)
+    - strides: frame strides tried after the smallest size, e.g. (1, 2, 3); 1 = every frame
+    - alpha: EWMA weight of each new latency sample
+    - down_margin: step down when cost > budget * (1 + down_margin)
+    - up_margin: step up only when the larger rung is predicted below budget * (1 - up_margin)
+    - patience: consecutive samples a condition must hold before acting
+    - cooldown: samples to wait after a change before acting again
+    """
+
+    def __init__(self, target_fps=10, sizes=None, strides=(1,), alpha=0.2, down_margin=0.1, up_margin=0.25,
+                 patience=5, cooldown=30, camera=None):
+        self.target_fps = float(target_fps)
+        self.sizes = list(sizes) if sizes else None
+        self.strides = sorted({max(1, int(s)) for s in strides} | {1})
+        self.alpha = alpha
+        self.down_margin = down_margin
+        self.up_margin = up_margin
+        self.patience = patience
+        self.cooldown = cooldown
+        self.camera = camera
+        self.ladder = []
+        self.level = 0
+        self.ewma = None
+        self.changes = 0
+        self._frame = -1
+        self._last_run = None
+        self._since_change = 0
+        self._over = 0
+        self._under = 0
+        if self.sizes:
+            self._build()
+
+    def configure(self, imgsz, camera=None):
+        """Called by the detector: derives the ladder from its imgsz unless sizes were given."""
+        if camera is not None and self.camera is None:
+            self.camera = camera
+        if self.sizes is None:
+            self.sizes = default_ladder(imgsz)
+            self._build()
+        return self
+
+    def _build(self):
+        self.ladder = [(s, 1) for s in self.sizes] + [(self.sizes[-1], k) for k in self.strides[1:]]
+        self.level = min(self.level, len(self.ladder) - 1)
+
+    @property
+    def imgsz(self):
+        return self.ladder[self.level][0]
+
+    @property
+    def stride(self):
+        return self.ladder[self.level][1]
+
+    def due(self):
+        """Advances one frame; True if this frame should be inferred at the current stride."""
+        self._frame += 1
+        if self._last_run is None or self._frame - self._last_run >= self.stride:
+            self._last_run = self._frame
+            return True
+        return False
+
+    def _predicted(self, level):
+        """Per-frame cost expected at another rung: latency ~ input pixels, spread over the stride."""
+        s, k = self.ladder[level]
+        return self.ewma * (s / self.imgsz) ** 2 / k
+
+    def observe(self, seconds):
+        """Feeds the latency of one inference call made at the current rung; may change rung."""
+        self._since_change += 1
+        if self._since_change == 1 and self.changes:
+            return  # first call at a new size pays allocation / re-planning: not representative
+        self.ewma = seconds if self.ewma is None else (1.0 - self.alpha) * self.ewma + self.alpha * seconds
+        if self._since_change <= self.cooldown:
+            return
+        budget = 1.0 / self.target_fps
+        if self.ewma / self.stride > budget * (1.0 + self.down_margin) and self.level < len(self.ladder) - 1:
+            self._over, self._under = self._over + 1, 0
+            if self._over >= self.patience:
+                self._move(+1)
+        elif self.level > 0 and self._predicted(self.level - 1) < budget * (1.0 - self.up_margin):
+            self._under, self._over = self._under + 1, 0
+            if self._under >= self.patience:
+                self._move(-1)
+        else:
+            self._over = self._under = 0
+
+    def _move(self, step):
+        old_size, old_stride = self.ladder[self.level]
+        self.ewma = self._predicted(self.level + step) * self.ladder[self.level + step][1]
+        self.level += step
+        self._since_change = 0
+        self._over = self._under = 0
+        self.changes += 1
+        log_info(f"[{self.camera}] autoscale {'down' if step > 0 else 'up'}: imgsz {old_size}->{self.imgsz}, "
+                 f"stride {old_stride}->{self.stride}", key=f"autoscale:{self.camera}:{self.changes}",
+                 camera=self.camera, imgsz=self.imgsz, stride=self.stride)
+
+    def status(self):
+        return {"imgsz": self.imgsz, "stride": self.stride, "level": self.level,
+                "latency_ms": None if self.ewma is None else round(self.ewma * 1000.0, 1),
+                "target_fps": self.target_fps, "changes": self.changes}
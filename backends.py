@@ -0,0 +1,108 @@
+# backends.py
+"""
+CPU inference backends.
+
+"torch" runs the .pt weights as before. "onnx" (ONNX Runtime) and "openvino"
+export the .pt once, cache the exported model next to it and load it through
+ultralytics' AutoBackend, so predict() / Results stay identical for
+PublicSecurity and HomeSecurity. The class-name mapping of the source weights
+is stored in a sidecar JSON so exported models report the same labels.
+"""
+import json
+import os
+
+import numpy as np
+
+from aegis_utils import log_info
+
+# backend -> (ultralytics export format, exported artifact suffix)
+BACKENDS = {
+    "torch": (None, None),
+    "onnx": ("onnx", ".onnx"),
+    "openvino": ("openvino", "_openvino_model"),
+}
+
+
+def _names_path(exported):
+    return exported.rstrip("/\\") + ".names.json"
+
+
+def exported_path(pt_path, backend):
+    fmt, suffix = BACKENDS[backend]
+    if fmt is None:
+        return pt_path
+    return os.path.splitext(pt_path)[0] + suffix
+
+
+def export_model(pt_path, backend, imgsz=640):
+    """
+    Exports pt_path for backend unless an export newer than the weights already exists.
+    Returns the path to load. Exports are dynamic-shape so imgsz / batch may vary at runtime.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend: {backend} (expected one of {sorted(BACKENDS)})")
+    fmt, _ = BACKENDS[backend]
+    if fmt is None:
+        return pt_path
+    target = exported_path(pt_path, backend)
+    if (os.path.exists(target) and os.path.exists(_names_path(target))
+            and (not os.path.exists(pt_path) or os.path.getmtime(target) >= os.path.getmtime(pt_path))):
+        return target
+
+    from ultralytics import YOLO
+    log_info(f"Exporting {pt_path} to {backend} (one-time, cached at {target})", key=f"export:{target}")
+    model = YOLO(pt_path)
+    out = model.export(format=fmt, imgsz=imgsz, dynamic=True, half=False, verbose=False)
+    if out and os.path.normpath(str(out)) != os.path.normpath(target) and os.path.exists(str(out)):
+        os.replace(str(out), target)
+    with open(_names_path(target), "w") as f:
+        json.dump({str(k): v for k, v in dict(model.model.names).items()}, f)
+    return target
+
+
+def load_model(path, backend="torch", imgsz=640):
+    """Returns a YOLO-compatible model for path on the given backend."""
+    from ultralytics import YOLO
+    target = export_model(path, backend, imgsz=imgsz)
+    return YOLO(target, task="detect") if backend != "torch" else YOLO(target)
+
+
+def model_names(model, path=None, backend="torch"):
+    """
+    Class-name mapping of a loaded model: the model's own names when available,
+    otherwise the sidecar written at export time. Raises if neither exists.
+    """
+    try:
+        return model.model.names
+    except Exception:
+        pass
+    if path is not None and backend != "torch":
+        with open(_names_path(exported_path(path, backend))) as f:
+            return {int(k): v for k, v in json.load(f).items()}
+    return model.names
+
+
+def check_parity(pt_path, backend, frames, conf=0.25, imgsz=640, iou_tol=0.9, conf_tol=0.05):
+    """
+    Runs the torch weights and the exported backend on the same frames and checks
+    that every reference detection has a same-class match with IoU >= iou_tol and
+    |conf diff| <= conf_tol. Returns (ok, report dict).
+    """
+    from detections import Detections, label_table, box_iou
+
+    ref_model = load_model(pt_path, "torch", imgsz)
+    alt_model = load_model(pt_path, backend, imgsz)
+    table = label_table(model_names(ref_model))
+    mismatched, total = 0, 0
+    for frame in frames:
+        ref = Detections.from_results(ref_model.predict(source=frame, conf=conf, imgsz=imgsz, verbose=False), table)
+        alt = Detections.from_results(alt_model.predict(source=frame, conf=conf, imgsz=imgsz, verbose=False), table)
+        total += len(ref)
+        unmatched = len(ref)
+        if len(ref) and len(alt):
+            iou = box_iou(ref.boxes, alt.boxes)
+            same_cls = ref.cls[:, None] == alt.cls[None, :]
+            close_conf = np.abs(ref.confs[:, None] - alt.confs[None, :]) <= conf_tol
+            unmatched = int((~((iou >= iou_tol) & same_cls & close_conf).any(axis=1)).sum())
+        mismatched += unmatched + max(0, len(alt) - len(ref))
+    return mismatched == 0, {"backend": backend, "frames": len(frames), "detections": total, "mismatched": mismatched}
@@ -0,0 +1,247 @@
+# batch_analyze.py
+"""
+Headless batch analysis of recorded footage.
+
+Splits each video into time segments, runs the public (fire/violence) or home
+detector over them in a pool of worker processes and streams detections to
+one JSONL (or Parquet) part file per segment. Finished segments are recorded
+in <out>/progress.jsonl with their source video and skipped on the next run,
+so an interrupted job resumes where it stopped.
+
+    python batch_analyze.py archive/*.mp4 --mode public --fire fire.pt --violence Violence.pt \\
+        --sample-fps 2 --batch 8 --workers 4 --out results/
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import cv2
+
+from aegis_utils import log_info, log_warn
+
+VIDEO_EXTS = (".mp4", ".avi", ".mkv", ".mov", ".m4v")
+PROGRESS_FILE = "progress.jsonl"  # one {"part", "source"} line per finished segment
+
+_detector = None  # per worker process
+_args = None
+
+
+def find_videos(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths += [os.path.join(root, f) for f in sorted(files) if f.lower().endswith(VIDEO_EXTS)]
+        else:
+            paths += sorted(glob.glob(item)) or [item]
+    return paths
+
+
+def plan_segments(path, segment_seconds):
+    """Returns [(path, start_frame, end_frame, fps)] covering the whole video."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        log_warn(f"Cannot open {path}; skipping", key=f"open:{path}")
+        return []
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total <= 0:
+        return [(path, 0, None, fps)]  # unknown length: one segment, read to EOF
+    step = max(1, int(segment_seconds * fps)) if segment_seconds else total
+    return [(path, s, min(s + step, total), fps) for s in range(0, total, step)]
+
+
+def part_path(out_dir, path, start, end, fmt):
+    # the same file name often appears in several camera folders: tag it with its absolute path
+    stem = os.path.splitext(os.path.basename(path))[0]
+    tag = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    end_s = "end" if end is None else str(end)
+    return os.path.join(out_dir, f"{stem}.{tag}.{start:08d}-{end_s}.{fmt}")
+
+
+def load_progress(out_dir):
+    """{part file name: absolute source path} for segments finished in earlier runs."""
+    done = {}
+    try:
+        with open(os.path.join(out_dir, PROGRESS_FILE)) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted run
+                done[entry["part"]] = entry["source"]
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _init_worker(args, threads):
+    global _detector, _args
+    _args = args
+    try:
+        import torch
+        torch.set_num_threads(threads)  # avoid every worker grabbing every core
+    except ImportError:
+        pass
+    cv2.setNumThreads(1)
+    if args.mode == "public":
+        from public_security import PublicSecurity
+        _detector = PublicSecurity(args.fire, args.violence, conf=args.conf, imgsz=args.imgsz,
+                                   parallel=False, backend=args.backend)
+    else:
+        from home_security import HomeSecurity
+        _detector = HomeSecurity(model_path=args.model, conf=args.conf, imgsz=args.imgsz, backend=args.backend,
+                                 alert_writer=False)
+
+
+def _detect_batch(frames):
+    if _args.mode == "public":
+        return [dets for _, dets in _detector.infer_batch(frames)]
+    return _detector.detect_batch(frames)
+
+
+class _JsonlWriter:
+    def __init__(self, path):
+        self._f = open(path, "w")
+
+    def write(self, rows):
+        for row in rows:
+            self._f.write(json.dumps(row) + "\n")
+
+    def close(self):
+        self._f.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._schema = pa.schema([("file", pa.string()), ("frame", pa.int64()), ("t", pa.float64()),
+                                  ("label", pa.string()), ("conf", pa.float32()), ("box", pa.list_(pa.int32()))])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        if rows:
+            self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def process_segment(task):
+    """Worker entry: streams one segment, writes its part file atomically. Returns (part, frames, detections)."""
+    path, start, end, fps, out_file = task
+    tmp = out_file + ".partial"
+    writer = _ParquetWriter(tmp) if _args.format == "parquet" else _JsonlWriter(tmp)
+    stride = max(1, int(round(fps / _args.sample_fps))) if _args.sample_fps else max(1, _args.sample_every)
+
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    index, sampled, n_dets = start, 0, 0
+    batch, batch_idx = [], []
+
+    def flush():
+        nonlocal n_dets
+        rows = []
+        for idx, dets in zip(batch_idx, _detect_batch(batch)):
+            for d in dets:
+                rows.append({"file": path, "frame": idx, "t": round(idx / fps, 3),
+                             "label": d["label"], "conf": round(d["conf"], 4), "box": d["box"]})
+        writer.write(rows)
+        n_dets += len(rows)
+        batch.clear()
+        batch_idx.clear()
+
+    try:
+        while end is None or index < end:
+            if (index - start) % stride:
+                # skipped frame: demux only, no colour conversion / copy
+                if not cap.grab():
+                    break
+                index += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            batch.append(frame)
+            batch_idx.append(index)
+            sampled += 1
+            index += 1
+            if len(batch) >= _args.batch:
+                flush()
+        if batch:
+            flush()
+    finally:
+        cap.release()
+        writer.close()
+    os.replace(tmp, out_file)
+    return out_file, sampled, n_dets
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Aegis batch analysis for recorded footage")
+    ap.add_argument("inputs", nargs="+", help="video files, globs or directories")
+    ap.add_argument("--mode", choices=["public", "home"], default="public")
+    ap.add_argument("--fire", default="fire.pt")
+    ap.add_argument("--violence", default="Violence.pt")
+    ap.add_argument("--model", default="yolov8n.pt", help="home model")
+    ap.add_argument("--backend", default="torch", choices=["torch", "onnx", "openvino"])
+    ap.add_argument("--conf", type=float, default=None)
+    ap.add_argument("--imgsz", type=int, default=None)
+    ap.add_argument("--sample-every", type=int, default=1, help="analyze every Nth frame")
+    ap.add_argument("--sample-fps", type=float, default=None, help="analyze N frames per second (overrides --sample-every)")
+    ap.add_argument("--batch", type=int, default=8)
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    ap.add_argument("--segment-seconds", type=float, default=300, help="split videos into segments of this length (0 = whole file)")
+    ap.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    ap.add_argument("--out", default="batch_results")
+    args = ap.parse_args()
+    # same defaults as the live detectors
+    if args.conf is None:
+        args.conf = 0.25 if args.mode == "public" else 0.35
+    if args.imgsz is None:
+        args.imgsz = 640 if args.mode == "public" else 320
+
+    os.makedirs(args.out, exist_ok=True)
+    done = load_progress(args.out)
+    tasks, skipped = [], 0
+    for path in find_videos(args.inputs):
+        source = os.path.abspath(path)
+        for _, start, end, fps in plan_segments(path, args.segment_seconds):
+            out_file = part_path(args.out, path, start, end, args.format)
+            if os.path.exists(out_file):
+                if done.get(os.path.basename(out_file)) == source:
+                    skipped += 1  # finished in an earlier run
+                    continue
+                log_warn(f"{out_file} exists but is not recorded for {source}; reprocessing",
+                         key=f"unrecorded:{out_file}")
+            tasks.append((path, start, end, fps, out_file))
+    log_info(f"{len(tasks)} segments to process ({skipped} already done), {args.workers} workers")
+    if not tasks:
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    t0 = time.perf_counter()
+    total_frames = total_dets = 0
+    sources = {t[4]: os.path.abspath(t[0]) for t in tasks}
+    with Pool(args.workers, initializer=_init_worker, initargs=(args, threads)) as pool, \
+            open(os.path.join(args.out, PROGRESS_FILE), "a") as progress:
+        for i, (out_file, frames, dets) in enumerate(pool.imap_unordered(process_segment, tasks), 1):
+            progress.write(json.dumps({"part": os.path.basename(out_file), "source": sources[out_file]}) + "\n")
+            progress.flush()
+            total_frames += frames
+            total_dets += dets
+            elapsed = time.perf_counter() - t0
+            log_info(f"[{i}/{len(tasks)}] {os.path.basename(out_file)}: {frames} frames, {dets} detections "
+                     f"({total_frames / elapsed:.1f} frames/s overall)", key=f"segment:{out_file}")
+    log_info(f"Done: {total_frames} frames analyzed, {total_dets} detections in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# benchmark.py
+"""
+Latency / throughput benchmark for PublicSecurity.
+
+Compares the original sequential path (fire then violence) against the
+parallel path, the batched path and the shared single-pass preprocessing
+path on synthetic frames, so it runs without a webcam. Example:
+
+    python benchmark.py --fire fire.pt --violence Violence.pt --frames 50 --batch 4
+
+With --backends, instead compares CPU inference backends on the fire weights
+and checks detection parity against torch on real images (ultralytics' sample
+images by default, or --parity-source images / videos, which should contain
+what the weights detect):
+
+    python benchmark.py --fire fire.pt --backends onnx openvino --parity-source clip.mp4
+"""
+import argparse
+import time
+import numpy as np
+
+from public_security import PublicSecurity
+
+
+def synthetic_frames(n, h=480, w=640, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 255, size=(h, w, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def parity_frames(sources=None, per_video=10):
+    """Frames for the parity check: images / first frames of videos, or ultralytics' sample images."""
+    import cv2
+    if not sources:
+        from ultralytics.utils import ASSETS
+        sources = sorted(str(p) for p in ASSETS.glob("*.jpg"))
+    frames = []
+    for path in sources:
+        image = cv2.imread(path)
+        if image is not None:
+            frames.append(image)
+            continue
+        cap = cv2.VideoCapture(path)
+        for _ in range(per_video):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    return frames
+
+
+def _time_single(ps, frames):
+    latencies = []
+    for f in frames:
+        t0 = time.perf_counter()
+        ps.infer_frame(f)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def _time_batched(ps, frames, batch):
+    latencies = []
+    for i in range(0, len(frames), batch):
+        chunk = frames[i:i + batch]
+        t0 = time.perf_counter()
+        ps.infer_batch(chunk)
+        latencies.append((time.perf_counter() - t0, len(chunk)))
+    return latencies
+
+
+def bench_public(fire_path, violence_path, n_frames=50, batch=4, imgsz=640, conf=0.25, warmup=3):
+    """Returns a dict of {mode: {"latency_ms": ..., "fps": ...}}."""
+    frames = synthetic_frames(n_frames)
+    warm = frames[:warmup]
+    report = {}
+
+    for mode, parallel, shared in (("sequential", False, False), ("parallel", True, False), ("shared", True, True)):
+        ps = PublicSecurity(fire_path, violence_path, conf=conf, imgsz=imgsz, parallel=parallel,
+                            shared_preprocess=shared)
+        if shared and ps.shared is None:
+            ps.close()
+            continue  # no torch networks to share a tensor between
+        _time_single(ps, warm)
+        lat = _time_single(ps, frames)
+        total = sum(lat)
+        report[mode] = {"latency_ms": 1000.0 * total / len(lat), "fps": len(lat) / total}
+        if parallel:
+            ps.infer_batch(warm)
+            lat_b = _time_batched(ps, frames, batch)
+            total_b = sum(t for t, _ in lat_b)
+            report[f"{mode}_batch{batch}"] = {
+                # per-frame latency is the wait for the whole batch
+                "latency_ms": 1000.0 * total_b / len(lat_b),
+                "fps": sum(n for _, n in lat_b) / total_b,
+            }
+        ps.close()
+    return report
+
+
+def bench_backends(pt_path, backends, n_frames=50, imgsz=640, conf=0.25, warmup=3, parity_sources=None):
+    """
+    Returns {backend: {"latency_ms", "fps", "parity"}}; timing uses synthetic frames, parity is
+    checked against torch on parity_frames(parity_sources) (noise frames detect nothing).
+    """
+    from backends import load_model, check_parity
+
+    frames = synthetic_frames(n_frames)
+    checked = parity_frames(parity_sources)
+    report = {}
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        model = load_model(pt_path, backend, imgsz=imgsz)
+        for f in frames[:warmup]:
+            model.predict(source=f, conf=conf, imgsz=imgsz, verbose=False)
+        t0 = time.perf_counter()
+        for f in frames:
+            model.predict(source=f, conf=conf, imgsz=imgsz, verbose=False)
+        total = time.perf_counter() - t0
+        report[backend] = {"latency_ms": 1000.0 * total / len(frames), "fps": len(frames) / total}
+        if backend != "torch":
+            ok, detail = check_parity(pt_path, backend, checked, conf=conf, imgsz=imgsz)
+            if not detail["detections"]:
+                report[backend]["parity"] = f"n/a (torch found nothing in {len(checked)} frames)"
+            else:
+                report[backend]["parity"] = ("ok" if ok else f"{detail['mismatched']} mismatched") + \
+                    f" ({detail['detections']} detections)"
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark Aegis PublicSecurity execution modes")
+    ap.add_argument("--fire", default="yolov8n.pt", help="fire model weights")
+    ap.add_argument("--violence", default="yolov8n.pt", help="violence model weights")
+    ap.add_argument("--frames", type=int, default=50)
+    ap.add_argument("--batch", type=int, default=4)
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--conf", type=float, default=0.25)
+    ap.add_argument("--backends", nargs="*", help="compare these backends (onnx, openvino) on --fire weights")
+    ap.add_argument("--parity-source", nargs="*", help="images / videos for the backend parity check "
+                                                        "(default: ultralytics sample images)")
+    args = ap.parse_args()
+
+    if args.backends:
+        report = bench_backends(args.fire, args.backends, n_frames=args.frames, imgsz=args.imgsz, conf=args.conf,
+                                parity_sources=args.parity_source)
+        base = report["torch"]["fps"]
+        for backend, r in report.items():
+            parity = f"  parity: {r['parity']}" if "parity" in r else ""
+            print(f"{backend:>10}: {r['latency_ms']:8.1f} ms/frame  {r['fps']:6.1f} FPS  (x{r['fps'] / base:.2f}){parity}")
+        return
+
+    report = bench_public(args.fire, args.violence, n_frames=args.frames, batch=args.batch,
+                          imgsz=args.imgsz, conf=args.conf)
+    base = report["sequential"]["fps"]
+    for mode, r in report.items():
+        print(f"{mode:>18}: {r['latency_ms']:8.1f} ms/call  {r['fps']:6.1f} FPS  (x{r['fps'] / base:.2f})")
+
+
+if __name__ == "__main__":
+    main()
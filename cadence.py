@@ -0,0 +1,100 @@
+# cadence.py
+import time
+
+from detections import Detections
+
+
+class ModelCadence:
+    """
+    How often one model runs.
+    - stride: run every Nth frame
+    - hz: alternatively, run at most this many times per second (overrides stride)
+    - boost_stride / boost_hz: denser cadence used while the model is detecting
+    - boost_frames: how many frames the boost lasts after the last detection
+    - carry: between runs, keep returning the last detections (flagged not fresh);
+      if False, nothing is reported until the next run
+    """
+
+    def __init__(self, stride=1, hz=None, boost_stride=1, boost_hz=None, boost_frames=30, carry=True):
+        self.stride = max(1, int(stride))
+        self.hz = hz
+        self.boost_stride = max(1, int(boost_stride))
+        self.boost_hz = boost_hz
+        self.boost_frames = boost_frames
+        self.carry = carry
+
+
+class _ModelState:
+    def __init__(self):
+        self.last_frame = None
+        self.last_time = None
+        self.boost_until = -1
+        self.detections = Detections()
+        self.runs = 0
+
+
+class CadenceScheduler:
+    """
+    Decides per frame which models are due and keeps each model's last
+    detections for the frames in between.
+
+        sched = CadenceScheduler({"fire": ModelCadence(hz=2), "violence": ModelCadence(stride=2)})
+        sched.tick()
+        if sched.due("fire"): sched.update("fire", run_fire(frame))
+        dets = sched.detections("fire")
+    """
+
+    def __init__(self, cadences):
+        self.cadences = dict(cadences)
+        self._state = {name: _ModelState() for name in self.cadences}
+        self.frame_index = -1
+
+    def tick(self):
+        """Advances to the next frame; call once per frame before due()."""
+        self.frame_index += 1
+        return self.frame_index
+
+    def boosted(self, name):
+        return self.frame_index <= self._state[name].boost_until
+
+    def due(self, name, now=None):
+        cad, st = self.cadences[name], self._state[name]
+        if st.last_frame is None:
+            return True
+        boosted = self.boosted(name)
+        hz = cad.boost_hz if boosted and cad.boost_hz else cad.hz
+        if hz:
+            now = time.perf_counter() if now is None else now
+            return now - st.last_time >= 1.0 / hz
+        stride = cad.boost_stride if boosted else cad.stride
+        return self.frame_index - st.last_frame >= stride
+
+    def update(self, name, detections, now=None):
+        """Records a fresh run of model `name`; detecting anything starts / extends its boost."""
+        st = self._state[name]
+        st.last_frame = self.frame_index
+        st.last_time = time.perf_counter() if now is None else now
+        st.detections = detections
+        st.runs += 1
+        if detections:
+            st.boost_until = self.frame_index + self.cadences[name].boost_frames
+
+    def detections(self, name):
+        """Detections to report for this frame: fresh if the model just ran, else carried over (or empty)."""
+        st = self._state[name]
+        if st.last_frame == self.frame_index:
+            return st.detections
+        if not self.cadences[name].carry:
+            return Detections()
+        return st.detections.stale()
+
+    def status(self):
+        out = {}
+        for name, st in self._state.items():
+            out[name] = {
+                "fresh": st.last_frame == self.frame_index,
+                "age_frames": None if st.last_frame is None else self.frame_index - st.last_frame,
+                "boosted": self.boosted(name),
+                "runs": st.runs,
+            }
+        return out
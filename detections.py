@@ -0,0 +1,148 @@
+# detections.py
+import numpy as np
+
+# one row per detection; boxes are pixel xyxy
+DETECTION_DTYPE = np.dtype([("box", np.int32, (4,)), ("conf", np.float32), ("cls", np.int32)])
+
+
+def label_table(names_map, tag=None):
+    """
+    Builds an object array so that table[cls_id] is the display label.
+    names_map may be a dict {id: name} (YOLOv8 style) or a list.
+    """
+    if isinstance(names_map, dict):
+        size = max((int(k) for k in names_map), default=-1) + 1
+        table = np.array([str(i) for i in range(size)], dtype=object)
+        for k, v in names_map.items():
+            table[int(k)] = v
+    else:
+        table = np.array(list(names_map), dtype=object)
+    if tag:
+        table = np.array([f"{tag}:{v}" for v in table], dtype=object)
+    return table
+
+
+def map_labels(cls_ids, table, tag=None):
+    """Vectorized class-id -> label lookup, falling back to str(id) for unknown ids."""
+    cls_ids = np.asarray(cls_ids, dtype=np.int64)
+    if len(table) == 0:
+        known = np.zeros(len(cls_ids), dtype=bool)
+    else:
+        known = (cls_ids >= 0) & (cls_ids < len(table))
+    labels = np.empty(len(cls_ids), dtype=object)
+    labels[known] = table[cls_ids[known]]
+    if not known.all():
+        prefix = f"{tag}:" if tag else ""
+        labels[~known] = [f"{prefix}{c}" for c in cls_ids[~known]]
+    return labels
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes -> (N, M) float32."""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(np.clip(a[:, 2:] - a[:, :2], 0, None), axis=1)
+    area_b = np.prod(np.clip(b[:, 2:] - b[:, :2], 0, None), axis=1)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0).astype(np.float32)
+
+
+class Detections:
+    """
+    Compact detection batch: a structured array (DETECTION_DTYPE) plus labels.
+    Behaves like the old list of {"label", "conf", "box"} dicts (len, iteration,
+    indexing, truthiness, +), but the dicts are only built when first accessed.
+    fresh marks rows produced by inference on this frame (False = carried over).
+    """
+
+    __slots__ = ("data", "labels", "fresh", "_dicts")
+
+    def __init__(self, data=None, labels=None, fresh=None):
+        self.data = np.zeros(0, dtype=DETECTION_DTYPE) if data is None else data
+        self.labels = np.empty(len(self.data), dtype=object) if labels is None else labels
+        self.fresh = np.ones(len(self.data), dtype=bool) if fresh is None else fresh
+        self._dicts = None
+
+    @classmethod
+    def from_results(cls, results, table, tag=None):
+        """
+        results: list of Results from ultralytics predict
+        Each Results is copied to host once (boxes.data -> [x1,y1,x2,y2,(id),conf,cls]);
+        boxes.data may already be a NumPy array (e.g. from a RemoteModel).
+        """
+        arrays = []
+        for r in results:
+            boxes = getattr(r, "boxes", None)
+            if boxes is None or len(boxes) == 0:
+                continue
+            data = boxes.data
+            arrays.append(data if isinstance(data, np.ndarray) else data.cpu().numpy())
+        if not arrays:
+            return cls()
+        raw = arrays[0] if len(arrays) == 1 else np.concatenate(arrays, axis=0)
+        data = np.empty(len(raw), dtype=DETECTION_DTYPE)
+        data["box"] = raw[:, :4]
+        data["conf"] = raw[:, -2]
+        data["cls"] = raw[:, -1]
+        return cls(data, map_labels(data["cls"], table, tag))
+
+    @classmethod
+    def concat(cls, parts):
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls()
+        if len(parts) == 1:
+            return parts[0]
+        return cls(np.concatenate([p.data for p in parts]), np.concatenate([p.labels for p in parts]),
+                   np.concatenate([p.fresh for p in parts]))
+
+    @property
+    def boxes(self):
+        return self.data["box"]
+
+    @property
+    def confs(self):
+        return self.data["conf"]
+
+    @property
+    def cls(self):
+        return self.data["cls"]
+
+    def select(self, mask):
+        """Returns a new Detections holding only the rows selected by mask / indices."""
+        return Detections(self.data[mask], self.labels[mask], self.fresh[mask])
+
+    def stale(self):
+        """Same detections flagged as carried over from an earlier frame."""
+        return Detections(self.data, self.labels, np.zeros(len(self.data), dtype=bool))
+
+    def to_dicts(self):
+        if self._dicts is None:
+            self._dicts = [
+                {"label": lbl, "conf": float(c), "box": b.tolist(), "fresh": bool(f)}
+                for lbl, c, b, f in zip(self.labels, self.data["conf"], self.data["box"], self.fresh)
+            ]
+        return self._dicts
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        return len(self.data) > 0
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    def __getitem__(self, i):
+        return self.to_dicts()[i]
+
+    def __add__(self, other):
+        if isinstance(other, Detections):
+            return Detections.concat([self, other])
+        return self.to_dicts() + list(other)
+
+    def __repr__(self):
+        return f"Detections(n={len(self)})"
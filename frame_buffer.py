@@ -0,0 +1,88 @@
+# frame_buffer.py
+import cv2
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    Fixed-capacity ring of BGR frames, preallocated on the first push and
+    written in place afterwards (no per-frame allocation).
+    - capacity: number of frames kept (e.g. buffer_seconds * fps)
+    - jpeg_quality: if set, frames are stored JPEG-compressed instead of raw,
+      so long pre-roll windows cost a fraction of the memory
+    """
+
+    def __init__(self, capacity, jpeg_quality=None):
+        self.capacity = max(1, int(capacity))
+        self.jpeg_quality = jpeg_quality
+        self._raw = None                      # (capacity, H, W, C) uint8
+        self._jpeg = [None] * self.capacity   # encoded slots when compressing
+        self._head = 0                        # next slot to write
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def push(self, frame):
+        if self.jpeg_quality is not None:
+            ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)])
+            if not ok:
+                return
+            self._jpeg[self._head] = buf
+        else:
+            if self._raw is None or self._raw.shape[1:] != frame.shape:
+                # first frame, or the camera changed resolution
+                self._raw = np.empty((self.capacity,) + frame.shape, dtype=frame.dtype)
+                self.clear()
+            np.copyto(self._raw[self._head], frame)
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _order(self):
+        start = (self._head - self._count) % self.capacity
+        return [(start + i) % self.capacity for i in range(self._count)]
+
+    def views(self):
+        """
+        Frames oldest -> newest. For raw storage these are zero-copy views into
+        the ring, valid only until the slots are overwritten by later pushes.
+        """
+        if self.jpeg_quality is not None:
+            return [cv2.imdecode(self._jpeg[i], cv2.IMREAD_COLOR) for i in self._order()]
+        return [self._raw[i] for i in self._order()]
+
+    def snapshot(self):
+        """Frames oldest -> newest as an independent (N, H, W, C) array, safe to hand to another thread."""
+        if self._count == 0:
+            return np.empty((0,), dtype=np.uint8)
+        if self.jpeg_quality is not None:
+            return np.stack(self.views())
+        return self._raw[self._order()]  # fancy indexing: one contiguous copy
+
+    def handoff(self):
+        """
+        Frames oldest -> newest in a form another thread may keep: a contiguous
+        snapshot for raw storage, or the encoded JPEG buffers themselves (which
+        push() replaces rather than overwrites) when compressing.
+        """
+        if self.jpeg_quality is not None:
+            return [self._jpeg[i] for i in self._order()]
+        return self.snapshot()
+
+    def latest(self):
+        if self._count == 0:
+            return None
+        i = (self._head - 1) % self.capacity
+        if self.jpeg_quality is not None:
+            return cv2.imdecode(self._jpeg[i], cv2.IMREAD_COLOR)
+        return self._raw[i]
+
+    @property
+    def nbytes(self):
+        if self.jpeg_quality is not None:
+            return sum(b.nbytes for b in self._jpeg if b is not None)
+        return 0 if self._raw is None else self._raw.nbytes
@@ -1,90 +1,237 @@
 
-import cv2
+import threading
 import time
 from collections import deque
-from ultralytics import YOLO
-from aegis_utils import save_frames_as_video, safe_timestamp_name, log_info, log_warn, ensure_dir
+from backends import export_model, load_model, model_names
+from aegis_utils import safe_timestamp_name, log_info, log_warn
+from alert_writer import AlertWriter
+from detections import Detections, label_table
+from frame_buffer import FrameRingBuffer
+from motion import MotionGate
+from metrics import metrics
+from annotate import Annotator
+from tracker import IouTracker
 
 class HomeSecurity:
     """
     Lightweight home guardian using yolov8n (auto-download if needed).
     - buffer_seconds: how many seconds of past frames to keep
     - fps: frames per second assumed
-    - trigger_frames: consecutive frames with detection to trigger
+    - trigger_frames: frames an object must be tracked (matched) before it triggers an alert
+    - track_gap: inferred frames a track may go unseen before it is forgotten; a
+      re-appearing object within the gap keeps its id and does not alert again
+    - buffer_jpeg_quality: store pre-alert frames JPEG-compressed (None = raw)
+    - post_seconds: seconds of frames after the trigger to append to the clip
+    - alert_writer: shared AlertWriter (one is created if not given; False = no alert clips,
+      e.g. offline analysis through detect_batch)
+    - alert_store: optional AlertStore; clips then go under its root and each alert
+      is indexed (camera, time range, detections, thumbnail) for later queries
+    - motion_gate: MotionGate to skip YOLO on static frames (True = defaults, None = always infer)
+    - registry: optional ModelRegistry to share already loaded weights across instances
+    - backend: "torch" (default), "onnx" or "openvino"; .pt weights are exported once and cached
+    - camera: name used to label this stream's latency metrics
+    - roi: optional RoiConfig; the model then runs on native-resolution crops of the
+      ROI polygons / tiles (batched) instead of the whole downscaled frame
+    - autoscale: optional LatencyAutoscaler; moves this camera between input sizes
+      (and frame strides) to hold its target FPS; current settings in info["scale"]
     """
 
-    def __init__(self, model_path="yolov8n.pt", conf=0.35, buffer_seconds=5, fps=15, trigger_frames=3, imgsz=320):
+    def __init__(self, model_path="yolov8n.pt", conf=0.35, buffer_seconds=5, fps=15, trigger_frames=3, imgsz=320,
+                 buffer_jpeg_quality=None, post_seconds=0, alert_writer=None, alert_store=None,
+                 motion_gate=None, registry=None, backend="torch", camera="home", roi=None, track_gap=15,
+                 autoscale=None):
         self.conf = conf
+        self.camera = camera
+        self.roi = roi
+        self.autoscale = autoscale.configure(imgsz if roi is None else roi.imgsz, camera) if autoscale else None
         self.buffer_seconds = buffer_seconds
         self.fps = fps
         self.trigger_frames = trigger_frames
         self.imgsz = imgsz
+        self.post_seconds = post_seconds
 
-        log_info(f"Loading home model ({model_path}) — will auto-download if missing.")
-        self.model = YOLO(model_path)  # yolov8n.pt will be downloaded automatically by ultralytics if absent
+        self.registry = registry
+        self.backend = backend
+        log_info(f"Loading home model ({model_path}, backend={backend}) — will auto-download if missing.")
+        # yolov8n.pt will be downloaded automatically by ultralytics if absent
+        if registry is not None:
+            self.model = registry.acquire(export_model(model_path, backend, imgsz=imgsz))
+        else:
+            self.model = load_model(model_path, backend, imgsz=imgsz)
 
-        # class names (COCO) are inside the model
+        # class names (COCO) are inside the model (or the export sidecar)
         try:
-            self.names = self.model.model.names
+            self.names = model_names(self.model, model_path, backend)
         except Exception:
             self.names = {}
+        self._label_table = label_table(self.names)
 
-        self.frame_buffer = deque(maxlen=int(self.buffer_seconds * self.fps))
-        self.detection_counter = 0
+        self.frame_buffer = FrameRingBuffer(int(self.buffer_seconds * self.fps), jpeg_quality=buffer_jpeg_quality)
+        self._stamps = deque(maxlen=self.frame_buffer.capacity)  # capture time of each buffered frame
+        self._buffer_lock = threading.Lock()
+        self._capture_hooked = False
+        self.tracker = IouTracker(max_gap=track_gap, min_hits=trigger_frames)
+        self._owns_writer = alert_writer is None
+        self.alert_writer = AlertWriter() if alert_writer is None else (alert_writer or None)
+        self.alert_store = alert_store
+        self.motion_gate = MotionGate() if motion_gate is True else motion_gate
+        self.last_detections = Detections()
+        self._last_track_ids = []
+        self.annotator = Annotator(camera=camera)
 
     def _parse_results(self, results):
-        detections = []
-        for r in results:
-            boxes = getattr(r, "boxes", None)
-            if boxes is None:
-                continue
-            for i in range(len(boxes.xyxy)):
-                xyxy = boxes.xyxy[i].cpu().numpy().astype(int).tolist()
-                conf = float(boxes.conf[i].cpu().numpy())
-                cls_id = int(boxes.cls[i].cpu().numpy())
-                label = self.names.get(cls_id, str(cls_id)) if isinstance(self.names, dict) else self.names[cls_id]
-                detections.append({"label": label, "conf": conf, "box": xyxy})
-        return detections
-
-    def process_frame(self, frame):
         """
-        Returns annotated frame, detections list, info dict:
-          info = {'triggered': bool, 'video_path': str or None, 'screenshot': str or None}
+        results: list of Results from ultralytics predict
+        returns Detections (iterates as dicts with label, conf, box)
+        """
+        with metrics.timer("parse", self.camera, "home"):
+            return Detections.from_results(results, self._label_table)
+
+    def _imgsz(self):
+        if self.autoscale is not None:
+            return self.autoscale.imgsz
+        return self.imgsz if self.roi is None else self.roi.imgsz
+
+    def _predict(self, source):
+        with metrics.timer("predict", self.camera, "home"):
+            results = self.model.predict(source=source, conf=self.conf, imgsz=self._imgsz(), verbose=False)
+        metrics.observe_results(results, self.camera, "home")
+        return results
+
+    def _detect(self, frame):
+        if self.roi is None:
+            return self._parse_results(self._predict(frame))
+        source = self.roi.cut(frame)
+        if not source:
+            return Detections()  # ROI masks out the whole frame
+        return self.roi.merge([self._parse_results([r]) for r in self._predict(source)], frame.shape)
+
+    def detect_batch(self, frames):
+        """
+        frames: list of BGR numpy arrays (e.g. sampled from a recording)
+        Runs a single batched predict over every frame (or every ROI crop of every frame)
+        and returns one Detections per frame. Detection only: no frame buffer, tracking or alerts.
+        """
+        if not frames:
+            return []
+        t0 = time.perf_counter()
+        sources = [[f] if self.roi is None else self.roi.cut(f) for f in frames]
+        flat = [s for per_frame in sources for s in per_frame]
+        results = self._predict(flat) if flat else []
+
+        outputs, i = [], 0
+        for frame, per_frame in zip(frames, sources):
+            j = i + len(per_frame)
+            per_source = [self._parse_results([r]) for r in results[i:j]]
+            outputs.append(per_source[0] if self.roi is None else self.roi.merge(per_source, frame.shape))
+            i = j
+        if self.autoscale is not None:
+            # every frame of a batch is inferred: only the input size adapts, on per-frame latency
+            self.autoscale.observe((time.perf_counter() - t0) / len(frames))
+        return outputs
+
+    def capture(self, frame, stamp=None):
+        """
+        Capture-stage hook (e.g. FramePipeline(on_capture=...)): buffers every camera frame,
+        including the ones the inference stage later drops, and feeds clips still collecting
+        post-trigger frames. Once used, process_frame stops buffering frames itself.
         """
-        # Add to circular buffer
-        self.frame_buffer.append(frame.copy())
-
-        # Run model
-        results = self.model.predict(source=frame, conf=self.conf, imgsz=self.imgsz)
-        detections = self._parse_results(results)
-
-        # annotate
-        annotated = frame.copy()
-        for d in detections:
-            x1, y1, x2, y2 = d["box"]
-            txt = f"{d['label']} {d['conf']:.2f}"
-            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
-            cv2.putText(annotated, txt, (x1, y1 - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1, cv2.LINE_AA)
-
-        # trigger logic
-        if detections:
-            self.detection_counter += 1
+        self._capture_hooked = True
+        self._buffer(frame, stamp)
+
+    def _buffer(self, frame, stamp=None):
+        with self._buffer_lock:
+            # Add to circular buffer (written in place into preallocated slots)
+            self.frame_buffer.push(frame)
+            self._stamps.append(time.time() if stamp is None else stamp)
+        # post-trigger frames for clips still being collected
+        if self.alert_writer is not None:
+            self.alert_writer.feed(frame, self.camera)
+
+    def _handoff(self):
+        """(pre-trigger frames, first capture time, measured frame rate) for an alert clip."""
+        with self._buffer_lock:
+            frames = self.frame_buffer.handoff()
+            stamps = list(self._stamps)
+        span = stamps[-1] - stamps[0] if len(stamps) > 1 else 0.0
+        # clips play back at the rate frames were actually buffered, not the assumed fps
+        fps = (len(stamps) - 1) / span if span > 0 else self.fps
+        return frames, (stamps[0] if stamps else time.time()), fps
+
+    def process_frame(self, frame, render=False):
+        """
+        Returns annotated frame (None unless render=True), detections list, info dict:
+          info = {'triggered': bool, 'video_path': str or None, 'screenshot': str or None,
+                  'job': AlertJob handle (None if the writer dropped the alert),
+                  'inferred': False if the motion gate / stride skipped YOLO and the last detections
+                              were reused (flagged stale),
+                  'track_ids': track id per detection (ints, aligned with detections),
+                  'new_tracks': ids of tracks confirmed on this frame (one alert covers them),
+                  'scale': autoscaler settings (imgsz, stride, latency_ms, ...) or None}
+        """
+        if not self._capture_hooked:
+            self._buffer(frame)
+
+        # Run model, unless the motion gate says the scene is static; keep
+        # inferring while a track is still unconfirmed so it can build up hits.
+        # Confirmed tracks coast through skipped frames, as do frames the autoscaler's stride skips.
+        if self.autoscale is not None and not self.autoscale.due():
+            inferred = False
+        elif self.motion_gate is None:
+            inferred = True
+        else:
+            with metrics.timer("motion_gate", self.camera):
+                inferred = self.motion_gate.should_infer(frame, force=self.tracker.tentative)
+        if inferred:
+            t0 = time.perf_counter()
+            detections = self._detect(frame)
+            if self.autoscale is not None:
+                self.autoscale.observe(time.perf_counter() - t0)
+            self.last_detections = detections
+            with metrics.timer("track", self.camera, "home"):
+                track_ids, new_tracks = self.tracker.update(detections)
+            self._last_track_ids = track_ids.tolist()
         else:
-            self.detection_counter = 0
+            # skipped frames carry no new evidence: tracks coast, nothing is aged, and the
+            # reused detections are flagged stale for consumers that only act on fresh ones
+            detections = self.last_detections.stale()
+            self.tracker.coast()
+            new_tracks = []
+
+        annotated = self.annotator.render(frame, detections) if render else None
+        info = {"inferred": inferred, "track_ids": self._last_track_ids, "new_tracks": new_tracks,
+                "scale": self.autoscale.status() if self.autoscale is not None else None}
 
-        if self.detection_counter >= self.trigger_frames:
+        # one alert per newly confirmed track (several confirmed together share a clip)
+        if new_tracks and self.alert_writer is not None:
             # prepare paths
             ts_name = safe_timestamp_name("home_alert")
-            ensure_dir("alerts")
-            video_path = f"alerts/{ts_name}.mp4"
-            screenshot_path = f"alerts/{ts_name}.jpg"
-            frames = list(self.frame_buffer)
-            saved = save_frames_as_video(frames, video_path, fps=self.fps)
-            # last frame as screenshot
-            if frames:
-                cv2.imwrite(screenshot_path, frames[-1])
-            log_warn(f"Home alert triggered. Saved: {video_path} (success={saved}), screenshot: {screenshot_path}")
-            self.detection_counter = 0
-            return annotated, detections, {"triggered": True, "video_path": video_path, "screenshot": screenshot_path}
-
-        return annotated, detections, {"triggered": False}
+            if self.alert_store is not None:
+                video_path = self.alert_store.path_for(ts_name, "mp4")
+                screenshot_path = self.alert_store.path_for(ts_name, "jpg")
+            else:
+                video_path = f"alerts/{ts_name}.mp4"
+                screenshot_path = f"alerts/{ts_name}.jpg"
+            # encoding and disk I/O happen on the writer's worker pool
+            pre_frames, start_ts, clip_fps = self._handoff()
+            job = self.alert_writer.submit(pre_frames, video_path, screenshot_path, fps=clip_fps,
+                                           post_frames=int(self.post_seconds * clip_fps), source=self.camera)
+            if self.alert_store is not None and job is not None:
+                self.alert_store.record(ts_name, self.camera, start_ts,
+                                        time.time() + self.post_seconds, detections, video_path, screenshot_path,
+                                        frame=frame, track_ids=self._last_track_ids, job=job)
+            log_warn(f"Home alert triggered by track(s) {new_tracks}. Queued: {video_path} "
+                     f"(accepted={job is not None}), screenshot: {screenshot_path}", key=f"home_alert:{video_path}")
+            info.update(triggered=True, video_path=video_path, screenshot=screenshot_path, job=job)
+            return annotated, detections, info
+
+        info["triggered"] = False
+        return annotated, detections, info
+
+    def close(self):
+        """Flushes pending alert clips (if this instance owns its writer) and releases registry leases."""
+        if self._owns_writer:
+            self.alert_writer.close()
+        if self.registry is not None:
+            self.registry.release(self.model)
+            self.registry = None
@@ -0,0 +1,130 @@
+# inference_scheduler.py
+"""
+CPU budget and request ordering for multi-camera inference.
+
+Left alone, every torch predict call spins up one intra-op thread per core
+and OpenCV adds its own pool, so N inference workers on a C-core box run
+N * C busy threads and throughput falls as cameras are added. The hub uses
+this module to:
+
+  * split the cores it may use into disjoint sets, one per inference worker
+    (plus a small reserved set for capture / UI), pin each worker to its set
+    and size its torch / OpenCV thread pools to match (plan_cores,
+    apply_worker_limits);
+  * pick which camera a worker serves next by priority instead of round
+    robin: a camera's configured base priority, raised while it has an
+    active threat (e.g. a public feed detecting violence), oldest frame
+    first among equals (PriorityPicker);
+  * account the time a frame waits for a worker separately from the time
+    the detector spends on it.
+"""
+import os
+import time
+
+from aegis_utils import log_info, log_warn
+
+# default labels that put a camera at the front of its worker's queue while they are being detected
+# (exact Detections labels; MultiCameraHub(urgent_labels=...) overrides them)
+URGENT_LABELS = ("violence:Violence", "fire:fire")
+
+
+def available_cores():
+    """Cores this process may run on (honours taskset / cgroup cpusets where the OS exposes them)."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        return list(range(os.cpu_count() or 1))
+
+
+def plan_cores(workers, reserve=1, cores=None):
+    """
+    Splits cores into `workers` disjoint sets after setting `reserve` aside for capture / UI.
+    Returns (reserved, [cores per worker]). With fewer cores than workers, sets are shared.
+    """
+    cores = list(cores if cores is not None else available_cores())
+    reserve = min(reserve, max(0, len(cores) - workers))
+    reserved, pool = cores[:reserve], cores[reserve:] or cores
+    if len(pool) < workers:
+        return reserved or pool, [[pool[w % len(pool)]] for w in range(workers)]
+    per_worker = [pool[w * len(pool) // workers:(w + 1) * len(pool) // workers] for w in range(workers)]
+    return reserved or pool, per_worker
+
+
+def apply_worker_limits(cores=None, torch_threads=None, cv_threads=1, use_torch=True):
+    """
+    Call first thing in a worker process, before torch is imported: pins the
+    process to cores and sizes torch's intra-op pool (default: one thread per
+    core) and OpenCV's pool. use_torch=False (capture processes) leaves torch
+    unimported. Returns the torch thread count used.
+    """
+    threads = max(1, torch_threads or (len(cores) if cores else 1))
+    if cores:
+        try:
+            os.sched_setaffinity(0, set(cores))
+        except (AttributeError, OSError) as e:
+            log_warn(f"Could not pin process {os.getpid()} to cores {cores}: {e}")
+    # OpenMP / MKL pools read these when they start
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import cv2
+        cv2.setNumThreads(cv_threads)
+    except ImportError:
+        pass
+    if not use_torch:
+        return threads
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)  # one predict at a time per worker
+        except RuntimeError:
+            pass  # already set, or parallel work already started in this process
+    except ImportError:
+        pass
+    return threads
+
+
+class PriorityPicker:
+    """
+    Chooses the next camera for one worker.
+    - priorities: {camera: base priority}; higher runs first (default 0)
+    - boost: added while a camera has urgent detections
+    - hold_s: how long the boost outlives the last urgent detection
+    - urgent_labels: detection labels (exact match) that count as urgent
+    """
+
+    def __init__(self, priorities=None, boost=10, hold_s=5.0, urgent_labels=URGENT_LABELS):
+        self.priorities = dict(priorities or {})
+        self.boost = boost
+        self.hold_s = hold_s
+        self.urgent_labels = frozenset(urgent_labels)
+        self._urgent_until = {}
+
+    def priority(self, camera, now=None):
+        now = time.monotonic() if now is None else now
+        base = self.priorities.get(camera, 0)
+        return base + (self.boost if self._urgent_until.get(camera, 0.0) > now else 0)
+
+    def update(self, camera, labels=(), triggered=False, now=None):
+        """
+        Feeds a camera's latest result; urgent labels or a triggered alert start / extend its boost.
+        Pass only labels inferred on this frame (Detections.fresh): carried-over detections would
+        keep the boost alive after the threat is gone.
+        """
+        now = time.monotonic() if now is None else now
+        if triggered or any(lbl in self.urgent_labels for lbl in labels):
+            self._urgent_until[camera] = now + self.hold_s
+
+    def pick(self, pending, now=None):
+        """pending: {camera: capture stamp of its newest unserved frame}. Highest priority, then oldest frame."""
+        if not pending:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(pending, key=lambda cam: (self.priority(cam, now), -pending[cam]))
+
+
+def log_plan(reserved, per_worker, threads):
+    log_info(f"Core plan: capture/UI on {reserved}; "
+             + "; ".join(f"worker {w} on {cores} ({t} torch threads)"
+                         for w, (cores, t) in enumerate(zip(per_worker, threads))))
@@ -0,0 +1,187 @@
+# metrics.py
+"""
+Hot-path latency instrumentation.
+
+    from metrics import metrics
+    with metrics.timer("parse", camera="cam0", model="fire"):
+        ...
+
+Samples go into rolling histograms keyed by (stage, camera, model). When
+metrics are disabled (the default unless AEGIS_METRICS=1 or enable() is
+called) timer() returns a shared no-op context manager, so instrumented code
+pays one attribute check per call.
+
+start_http_server() exposes everything in Prometheus text format on a local
+port; snapshot() returns the same data for the Streamlit stats panel.
+"""
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# seconds; roughly log-spaced from 0.5 ms to 5 s
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0)
+        return False
+
+
+class RollingHistogram:
+    """
+    Cumulative Prometheus buckets plus a ring of the last `window` samples
+    for rolling quantiles.
+    """
+
+    def __init__(self, window=1024):
+        self.counts = np.zeros(len(BUCKETS) + 1, dtype=np.int64)  # last slot = +Inf
+        self.total = 0
+        self.sum = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        idx = int(np.searchsorted(BUCKETS, seconds))
+        with self._lock:
+            self.counts[idx] += 1
+            self.total += 1
+            self.sum += seconds
+            self._recent.append(seconds)
+
+    def quantiles(self, qs=(50, 95, 99)):
+        with self._lock:
+            recent = np.fromiter(self._recent, dtype=np.float64, count=len(self._recent))
+        if recent.size == 0:
+            return {q: 0.0 for q in qs}
+        return dict(zip(qs, np.percentile(recent, qs)))
+
+    def totals(self):
+        """Consistent (bucket counts copy, total, sum)."""
+        with self._lock:
+            return self.counts.copy(), self.total, self.sum
+
+
+class Metrics:
+    def __init__(self, enabled=False, window=1024):
+        self.enabled = enabled
+        self.window = window
+        self._hists = {}
+        self._lock = threading.Lock()
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    def _hist(self, stage, camera, model):
+        key = (stage, camera or "", model or "")
+        hist = self._hists.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(key, RollingHistogram(self.window))
+        return hist
+
+    def timer(self, stage, camera=None, model=None):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._hist(stage, camera, model))
+
+    def observe(self, stage, seconds, camera=None, model=None):
+        if self.enabled:
+            self._hist(stage, camera, model).observe(seconds)
+
+    def observe_results(self, results, camera=None, model=None):
+        """Records ultralytics' own per-call preprocess / inference / postprocess times (ms)."""
+        if not self.enabled:
+            return
+        for r in results or ():
+            speed = getattr(r, "speed", None) or {}
+            for stage in ("preprocess", "inference", "postprocess"):
+                if speed.get(stage) is not None:
+                    self._hist(stage, camera, model).observe(speed[stage] / 1000.0)
+
+    def _series(self):
+        # copied under the lock: another thread may be adding a series while we format
+        with self._lock:
+            return sorted(self._hists.items())
+
+    def snapshot(self):
+        """[{stage, camera, model, count, mean_ms, p50_ms, p95_ms, p99_ms}] for every series."""
+        rows = []
+        for (stage, camera, model), h in self._series():
+            q = h.quantiles()
+            _, total, total_s = h.totals()
+            rows.append({"stage": stage, "camera": camera, "model": model, "count": total,
+                         "mean_ms": round(1000.0 * total_s / total, 2) if total else 0.0,
+                         "p50_ms": round(1000.0 * q[50], 2), "p95_ms": round(1000.0 * q[95], 2),
+                         "p99_ms": round(1000.0 * q[99], 2)})
+        return rows
+
+    def prometheus(self):
+        lines = ["# HELP aegis_stage_seconds Latency of Aegis pipeline stages.",
+                 "# TYPE aegis_stage_seconds histogram"]
+        for (stage, camera, model), h in self._series():
+            labels = f'stage="{stage}",camera="{camera}",model="{model}"'
+            counts, total, total_s = h.totals()
+            cumulative = np.cumsum(counts)
+            for le, c in zip(BUCKETS, cumulative):
+                lines.append(f'aegis_stage_seconds_bucket{{{labels},le="{le}"}} {c}')
+            lines.append(f'aegis_stage_seconds_bucket{{{labels},le="+Inf"}} {cumulative[-1]}')
+            lines.append(f"aegis_stage_seconds_sum{{{labels}}} {total_s:.6f}")
+            lines.append(f"aegis_stage_seconds_count{{{labels}}} {total}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(enabled=os.environ.get("AEGIS_METRICS", "0") not in ("", "0", "false"))
+
+_server = None
+
+
+def start_http_server(port=9108, host="127.0.0.1", registry=None):
+    """Serves /metrics in Prometheus text format from a daemon thread. Idempotent; returns the server."""
+    global _server
+    if _server is not None:
+        return _server
+    source = registry or metrics
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = source.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # keep scrapes out of the console
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, name="aegis-metrics", daemon=True).start()
+    return _server
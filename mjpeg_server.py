@@ -0,0 +1,182 @@
+# mjpeg_server.py
+"""
+Local MJPEG display path.
+
+The detection loop publish()es annotated BGR frames to a named stream; a
+per-stream encoder thread JPEG-encodes the newest frame at most max_fps times
+a second (and only while someone is watching). Every viewer of
+http://host:port/stream/<name>.mjpg is sent the same encoded bytes, so extra
+viewers cost socket writes, not encodes.
+
+The server binds to 127.0.0.1 unless told otherwise (there is no
+authentication), and only serves streams the application registered with
+stream(); any other name is a 404.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+from aegis_utils import log_info
+from metrics import metrics
+
+BOUNDARY = "aegisframe"
+
+
+class MjpegStream:
+    def __init__(self, name, max_fps=15, quality=80):
+        self.name = name
+        self.max_fps = max_fps
+        self.quality = quality
+        self.viewers = 0
+        self.encoded = 0
+        self._pending = None        # newest published frame not yet encoded
+        self._jpeg = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._encoder = threading.Thread(target=self._encode_loop, name=f"aegis-mjpeg-{name}", daemon=True)
+        self._encoder.start()
+
+    def publish(self, frame):
+        """Hands the newest frame to the encoder. Never blocks on encoding; frame must not be modified afterwards."""
+        with self._cond:
+            self._pending = frame
+            self._cond.notify_all()
+
+    def ready(self):
+        """
+        True when a newly published frame would be shown: someone is watching and
+        the encoder has taken the previous frame. Lets callers skip rendering
+        frames that would only be overwritten.
+        """
+        return self.viewers > 0 and self._pending is None
+
+    def _encode_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)]
+        next_due = 0.0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None and self.viewers > 0)
+                frame, self._pending = self._pending, None
+            with metrics.timer("encode", self.name):  # stream name == camera label in the app
+                ok, buf = cv2.imencode(".jpg", frame, params)
+            if ok:
+                with self._cond:
+                    self._jpeg = buf.tobytes()
+                    self._seq += 1
+                    self.encoded += 1
+                    self._cond.notify_all()
+            # throttle to the display rate, independent of how fast frames are published
+            now = time.perf_counter()
+            next_due = max(next_due + 1.0 / self.max_fps, now)
+            time.sleep(max(0.0, next_due - now))
+
+    def latest(self):
+        return self._jpeg
+
+    def frames(self, timeout=5.0):
+        """Yields each newly encoded JPEG once; used by HTTP viewers."""
+        with self._cond:
+            self.viewers += 1
+            self._cond.notify_all()
+        try:
+            seen = -1
+            while True:
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self._seq != seen, timeout=timeout):
+                        continue
+                    seen, jpeg = self._seq, self._jpeg
+                if jpeg is not None:
+                    yield jpeg
+        finally:
+            with self._cond:
+                self.viewers -= 1
+
+
+class MjpegServer:
+    def __init__(self, port=8765, host="127.0.0.1", max_fps=15, quality=80):
+        self.port = port
+        self.host = host
+        self.max_fps = max_fps
+        self.quality = quality
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="aegis-mjpeg-http", daemon=True).start()
+        log_info(f"MJPEG server on {host}:{port}")
+
+    def stream(self, name):
+        """Registers (or returns) the stream `name`; only registered streams are served."""
+        with self._lock:
+            s = self._streams.get(name)
+            if s is None:
+                s = self._streams[name] = MjpegStream(name, self.max_fps, self.quality)
+            return s
+
+    def lookup(self, name):
+        """The registered stream `name`, or None. Never creates one."""
+        with self._lock:
+            return self._streams.get(name)
+
+    def url(self, name, host="localhost"):
+        return f"http://{host}:{self.port}/stream/{name}.mjpg"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path.startswith("/stream/") and path.endswith(".mjpg"):
+                    stream = server.lookup(path[len("/stream/"):-len(".mjpg")])
+                    if stream is None:
+                        self.send_error(404)
+                        return
+                    self._stream(stream)
+                elif path.startswith("/snapshot/") and path.endswith(".jpg"):
+                    stream = server.lookup(path[len("/snapshot/"):-len(".jpg")])
+                    jpeg = stream.latest() if stream is not None else None
+                    if jpeg is None:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/jpeg")
+                    self.send_header("Content-Length", str(len(jpeg)))
+                    self.end_headers()
+                    self.wfile.write(jpeg)
+                else:
+                    self.send_error(404)
+
+            def _stream(self, stream):
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache, private")
+                self.end_headers()
+                try:
+                    for jpeg in stream.frames():
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # viewer went away
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_server(port=8765, **kwargs):
+    """Process-wide MJPEG server, started on first use and shared by all sessions."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = MjpegServer(port=port, **kwargs)
+        return _server
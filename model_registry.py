@@ -0,0 +1,370 @@
+# model_registry.py
+"""
+Process-wide model registry.
+
+Each weights file is loaded once, warmed up with a dummy inference and then
+shared by every session / camera that asks for it. Leases are reference
+counted; models nobody holds are evicted after idle_timeout seconds.
+
+An optional InferenceServer exposes the same registry to other processes over
+a local socket (multiprocessing.connection); RemoteModel is its client and
+quacks like a YOLO object for predict() / .model.names. Connections are
+authenticated with a per-server random key: clients get it from
+InferenceServer.authkey or the AEGIS_INFERENCE_AUTHKEY environment variable
+(hex), never from a built-in default.
+"""
+import importlib
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+from aegis_utils import log_info, log_warn
+
+
+def _load_yolo(path):
+    from ultralytics import YOLO
+    # exported models (onnx / openvino) carry no task in the file name
+    return YOLO(path) if str(path).endswith(".pt") else YOLO(path, task="detect")
+
+
+class SharedModel:
+    """
+    A loaded model shared between callers. predict() is serialized with a lock
+    because the ultralytics predictor keeps per-call state on the model object;
+    callers driving the torch network directly hold the same lock. Other
+    attributes (e.g. .model.names) are passed through.
+    """
+
+    def __init__(self, path, model):
+        self.path = path
+        self._model = model
+        self._lock = threading.Lock()
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.load_s = 0.0
+        self.warmup_s = 0.0
+
+    @property
+    def lock(self):
+        return self._lock
+
+    def predict(self, *args, **kwargs):
+        with self._lock:
+            self.last_used = time.monotonic()
+            return self._model.predict(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class ModelRegistry:
+    """
+    - loader: callable(path) -> model (defaults to ultralytics.YOLO)
+    - warmup_imgsz: size of the dummy frame used to warm each model (0 = no warmup)
+    - idle_timeout: seconds an unreferenced model is kept before eviction (None = forever)
+    """
+
+    def __init__(self, loader=None, warmup_imgsz=320, idle_timeout=600):
+        self.loader = loader or _load_yolo
+        self.warmup_imgsz = warmup_imgsz
+        self.idle_timeout = idle_timeout
+        self._models = {}
+        self._lock = threading.Lock()
+        self._loading = {}  # path -> Lock, so a weights file is never loaded twice concurrently
+        self._preloading = set()  # paths / modules queued on a background preload thread
+        self._janitor = None
+
+    def _load(self, path):
+        t0 = time.perf_counter()
+        log_info(f"Registry loading model: {path}", key=f"registry_load:{path}")
+        model = self.loader(path)
+        # fuse / eval once, before the model is shared: doing it later would mutate it under other users
+        from preprocess import SharedPreprocessor, network_of
+        net = network_of(model)
+        if net is not None:
+            SharedPreprocessor.prepare_network(net)
+        entry = SharedModel(path, model)
+        entry.load_s = time.perf_counter() - t0
+        if self.warmup_imgsz:
+            t0 = time.perf_counter()
+            dummy = np.zeros((self.warmup_imgsz, self.warmup_imgsz, 3), dtype=np.uint8)
+            try:
+                entry.predict(source=dummy, imgsz=self.warmup_imgsz, verbose=False)
+            except Exception as e:
+                log_warn(f"Warmup failed for {path}: {e}", key=f"registry_warmup:{path}")
+            entry.warmup_s = time.perf_counter() - t0
+        log_info(f"Model ready: {path} (load {entry.load_s:.2f}s, warmup {entry.warmup_s:.2f}s)",
+                 key=f"registry_ready:{path}")
+        return entry
+
+    def _take(self, path):
+        """Looks up path and takes a reference in one step (call with self._lock held), or None."""
+        entry = self._models.get(path)
+        if entry is not None:
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+        return entry
+
+    def acquire(self, path):
+        """Returns the shared model for path, loading it on first use. Pair with release()."""
+        # the reference is taken under the same lock as the lookup, so the janitor
+        # can never evict an entry between the two
+        with self._lock:
+            entry = self._take(path)
+            if entry is None:
+                load_lock = self._loading.setdefault(path, threading.Lock())
+        if entry is None:
+            with load_lock:
+                with self._lock:
+                    entry = self._take(path)
+                if entry is None:
+                    entry = self._load(path)
+                    with self._lock:
+                        self._models[path] = entry
+                        self._loading.pop(path, None)
+                        entry = self._take(path)
+        self._start_janitor()
+        return entry
+
+    def release(self, model_or_path):
+        path = model_or_path.path if isinstance(model_or_path, SharedModel) else model_or_path
+        with self._lock:
+            entry = self._models.get(path)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+                entry.last_used = time.monotonic()
+
+    @contextmanager
+    def lease(self, path):
+        model = self.acquire(path)
+        try:
+            yield model
+        finally:
+            self.release(model)
+
+    def preload(self, *paths):
+        """Loads and warms models without holding a reference (eligible for idle eviction)."""
+        for p in paths:
+            self.release(self.acquire(p))
+
+    def preload_async(self, *paths, resolve=None, imports=()):
+        """
+        Imports modules and preloads paths on a daemon thread, so a later acquire()
+        finds them ready (or waits for the in-flight load instead of starting another).
+        resolve: optional callable(path) -> path to load (e.g. export_model), run on the thread.
+        Anything already loaded or queued is skipped; returns the thread or None.
+        """
+        with self._lock:
+            mods = [m for m in imports if ("import", m) not in self._preloading]
+            todo = [p for p in paths if p not in self._models and p not in self._preloading]
+            self._preloading.update(("import", m) for m in mods)
+            self._preloading.update(todo)
+        if not mods and not todo:
+            return None
+
+        def run():
+            for m in mods:
+                t0 = time.perf_counter()
+                try:
+                    importlib.import_module(m)
+                    log_info(f"Preloaded module {m} ({time.perf_counter() - t0:.2f}s)", key=f"preload:{m}")
+                except Exception as e:
+                    log_warn(f"Preload import of {m} failed: {e}", key=f"preload:{m}")
+            for p in todo:
+                try:
+                    self.preload(resolve(p) if resolve else p)
+                except Exception as e:
+                    log_warn(f"Preload of {p} failed: {e}", key=f"preload:{p}")
+                finally:
+                    with self._lock:
+                        self._preloading.discard(p)
+
+        t = threading.Thread(target=run, name="aegis-preload", daemon=True)
+        t.start()
+        return t
+
+    def evict_idle(self, now=None):
+        if self.idle_timeout is None:
+            return []
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stale = [p for p, e in self._models.items() if e.refs == 0 and now - e.last_used >= self.idle_timeout]
+            for p in stale:
+                del self._models[p]
+        for p in stale:
+            log_info(f"Registry evicted idle model: {p}", key=f"registry_evict:{p}")
+        return stale
+
+    def _start_janitor(self):
+        if self.idle_timeout is None or (self._janitor is not None and self._janitor.is_alive()):
+            return
+
+        def loop():
+            while True:
+                time.sleep(max(1.0, self.idle_timeout / 4.0))
+                self.evict_idle()
+
+        self._janitor = threading.Thread(target=loop, name="aegis-registry-janitor", daemon=True)
+        self._janitor.start()
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {p: {"refs": e.refs, "idle_s": round(now - e.last_used, 1),
+                        "load_s": round(e.load_s, 3), "warmup_s": round(e.warmup_s, 3)}
+                    for p, e in self._models.items()}
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def get_registry():
+    """The process-wide registry shared by every Streamlit session in this process."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
+
+
+# ------------------------------
+# Optional out-of-process server
+# ------------------------------
+DEFAULT_ADDRESS = ("127.0.0.1", 6070)
+AUTHKEY_ENV = "AEGIS_INFERENCE_AUTHKEY"
+
+
+def env_authkey():
+    """The shared key from $AEGIS_INFERENCE_AUTHKEY (hex), or None if it is not set."""
+    value = os.environ.get(AUTHKEY_ENV)
+    return bytes.fromhex(value) if value else None
+
+
+class InferenceServer:
+    """
+    Serves registry models to other processes. Requests are dicts:
+      {"op": "names", "model": path}
+      {"op": "predict", "model": path, "frames": [ndarray, ...], "conf": .., "imgsz": ..}
+    predict replies with one (N, 6) float32 array [x1,y1,x2,y2,conf,cls] per frame.
+    authkey: shared secret (None = $AEGIS_INFERENCE_AUTHKEY, else a random key); hand
+    self.authkey to clients
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None, registry=None):
+        self.address = address
+        self.authkey = authkey or env_authkey() or secrets.token_bytes(32)
+        self.registry = registry or get_registry()
+        self._listener = None
+
+    def serve_forever(self):
+        self._listener = Listener(self.address, authkey=self.authkey)
+        log_info(f"Inference server listening on {self.address}")
+        while True:
+            conn = self._listener.accept()
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        held = {}
+        try:
+            while True:
+                try:
+                    req = conn.recv()
+                except EOFError:
+                    break
+                try:
+                    path = req["model"]
+                    if path not in held:
+                        held[path] = self.registry.acquire(path)
+                    model = held[path]
+                    if req["op"] == "names":
+                        conn.send({"ok": True, "names": dict(model.model.names)})
+                    elif req["op"] == "predict":
+                        results = model.predict(source=req["frames"], conf=req.get("conf", 0.25),
+                                                imgsz=req.get("imgsz", 640), verbose=False)
+                        conn.send({"ok": True, "boxes": [r.boxes.data.cpu().numpy().astype(np.float32)[:, [0, 1, 2, 3, -2, -1]]
+                                                         for r in results]})
+                    else:
+                        conn.send({"ok": False, "error": f"unknown op {req['op']}"})
+                except Exception as e:
+                    conn.send({"ok": False, "error": str(e)})
+        finally:
+            for m in held.values():
+                self.registry.release(m)
+            conn.close()
+
+
+class _RemoteBoxes:
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+
+class _RemoteResult:
+    def __init__(self, data):
+        self.boxes = _RemoteBoxes(data)
+
+
+class _RemoteNames:
+    def __init__(self, names):
+        self.names = names
+
+
+class RemoteModel:
+    """
+    Client for InferenceServer; usable wherever a YOLO model is expected for predict().
+    authkey: the server's key (None = $AEGIS_INFERENCE_AUTHKEY)
+    """
+
+    def __init__(self, path, address=DEFAULT_ADDRESS, authkey=None):
+        authkey = authkey or env_authkey()
+        if not authkey:
+            raise ValueError(f"RemoteModel needs the server's authkey (argument or ${AUTHKEY_ENV})")
+        self.path = path
+        self._conn = Client(address, authkey=authkey)
+        self._lock = threading.Lock()
+        self.model = _RemoteNames(self._call({"op": "names", "model": path})["names"])
+
+    def _call(self, req):
+        with self._lock:
+            self._conn.send(req)
+            reply = self._conn.recv()
+        if not reply.get("ok"):
+            raise RuntimeError(f"inference server error: {reply.get('error')}")
+        return reply
+
+    def predict(self, source, conf=0.25, imgsz=640, **kwargs):
+        frames = list(source) if isinstance(source, (list, tuple)) else [source]
+        reply = self._call({"op": "predict", "model": self.path, "frames": frames, "conf": conf, "imgsz": imgsz})
+        return [_RemoteResult(b) for b in reply["boxes"]]
+
+    def close(self):
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Aegis local inference server")
+    ap.add_argument("--host", default=DEFAULT_ADDRESS[0])
+    ap.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1])
+    ap.add_argument("--preload", nargs="*", default=[], help="weights to load and warm at startup")
+    ap.add_argument("--authkey-file", default=os.path.join(os.path.expanduser("~"), ".aegis", "inference.key"),
+                    help=f"where to write the key clients need (hex, owner-only); ${AUTHKEY_ENV} overrides")
+    args = ap.parse_args()
+    server = InferenceServer((args.host, args.port))
+    if not env_authkey():
+        os.makedirs(os.path.dirname(os.path.abspath(args.authkey_file)), exist_ok=True)
+        fd = os.open(args.authkey_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(server.authkey.hex())
+        log_info(f"Inference server key written to {args.authkey_file}; "
+                 f"clients: export {AUTHKEY_ENV}=$(cat {args.authkey_file})")
+    server.registry.preload(*args.preload)
+    server.serve_forever()
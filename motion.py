@@ -0,0 +1,98 @@
+# motion.py
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap pre-filter deciding whether a frame is worth running YOLO on.
+    - method: "diff" (downscaled difference against a running-average background)
+              or "mog2" (OpenCV background subtractor)
+    - sensitivity: fraction (0-1) of watched pixels that must change to count as motion
+    - pixel_threshold: per-pixel grey-level change considered "changed" (diff method)
+    - mask: optional uint8/bool array (frame size) or list of polygons [[(x, y), ...], ...]
+      in full-frame pixels; only non-zero / inside areas are watched
+    - width: processing width; frames are downscaled to this first
+    - max_skip: force inference at least every N frames even without motion (0 = never)
+    """
+
+    def __init__(self, method="diff", sensitivity=0.005, pixel_threshold=25, mask=None, width=160,
+                 max_skip=30, learning_rate=0.05):
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"unknown motion method: {method}")
+        self.method = method
+        self.sensitivity = sensitivity
+        self.pixel_threshold = pixel_threshold
+        self.width = width
+        self.max_skip = max_skip
+        self.learning_rate = learning_rate
+        self._mask_spec = mask
+        self._mask = None          # downscaled boolean mask, built on first frame
+        self._shape = None
+        self._background = None    # float32 running average (diff method)
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False) if method == "mog2" else None
+        self._since_run = 0
+
+        self.frames = 0
+        self.skipped = 0
+        self.last_score = 0.0
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.width / float(w)
+        size = (self.width, max(1, int(round(h * scale))))
+        if self._shape != (h, w):
+            self._shape = (h, w)
+            self._background = None
+            self._mask = self._build_mask(size, scale)
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(grey, (5, 5), 0)
+
+    def _build_mask(self, size, scale):
+        spec = self._mask_spec
+        if spec is None:
+            return None
+        if isinstance(spec, np.ndarray):
+            return cv2.resize(spec.astype(np.uint8), size, interpolation=cv2.INTER_NEAREST) > 0
+        mask = np.zeros((size[1], size[0]), dtype=np.uint8)
+        polys = [np.round(np.asarray(p, dtype=np.float32) * scale).astype(np.int32) for p in spec]
+        cv2.fillPoly(mask, polys, 1)
+        return mask > 0
+
+    def motion_score(self, frame):
+        """Fraction of watched pixels that changed; also updates the background model."""
+        grey = self._prepare(frame)
+        if self.method == "mog2":
+            changed = self._subtractor.apply(grey) > 0
+        else:
+            if self._background is None:
+                self._background = grey.astype(np.float32)
+                return 1.0  # no reference yet: treat as motion
+            diff = cv2.absdiff(grey, cv2.convertScaleAbs(self._background))
+            changed = diff > self.pixel_threshold
+            cv2.accumulateWeighted(grey, self._background, self.learning_rate)
+        if self._mask is not None:
+            watched = int(self._mask.sum())
+            return float(np.count_nonzero(changed & self._mask)) / watched if watched else 0.0
+        return float(np.count_nonzero(changed)) / changed.size
+
+    def should_infer(self, frame, force=False):
+        """True if the frame has motion (or a refresh / force is due). Updates the stats."""
+        self.frames += 1
+        self.last_score = self.motion_score(frame)
+        due = self.max_skip and self._since_run >= self.max_skip
+        if force or due or self.last_score >= self.sensitivity:
+            self._since_run = 0
+            return True
+        self._since_run += 1
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / self.frames if self.frames else 0.0,
+            "last_score": self.last_score,
+        }
@@ -0,0 +1,217 @@
+# pipeline.py
+"""
+Capture -> inference -> presentation pipeline.
+
+Each stage runs on its own thread and hands work to the next one through a
+bounded "latest frame wins" queue: when a consumer is slower than its producer
+the oldest pending item is dropped, so the next frame inferred is always the
+newest one the camera produced and latency stays bounded.
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from aegis_utils import log_error, log_info, log_warn
+from metrics import metrics
+
+
+class Empty(Exception):
+    pass
+
+
+class LatestQueue:
+    """Bounded queue whose put() never blocks: it drops the oldest item instead."""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout=timeout):
+                raise Empty()
+            return self._items.popleft()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StageStats:
+    """Per-stage counters; fps is measured over a sliding window of recent items."""
+
+    def __init__(self, name, window=60):
+        self.name = name
+        self.count = 0
+        self.busy_s = 0.0
+        self._stamps = deque(maxlen=window)
+
+    def record(self, busy_s):
+        self.count += 1
+        self.busy_s += busy_s
+        self._stamps.append(time.perf_counter())
+
+    @property
+    def fps(self):
+        if len(self._stamps) < 2:
+            return 0.0
+        span = self._stamps[-1] - self._stamps[0]
+        return (len(self._stamps) - 1) / span if span > 0 else 0.0
+
+    def as_dict(self):
+        return {"count": self.count, "fps": round(self.fps, 2),
+                "avg_ms": round(1000.0 * self.busy_s / self.count, 2) if self.count else 0.0}
+
+
+class FramePipeline:
+    """
+    source: camera index / video path, or an already opened cv2.VideoCapture
+    infer_fn: callable(frame) -> result; None passes frames straight through
+    on_capture: optional callable(frame, capture_time) run on the capture thread for every
+      frame, before stale frames are dropped (e.g. HomeSecurity.capture for alert pre-roll)
+    queue_size: pending items kept between stages (1 = always newest)
+    camera: name used to label this stream's latency metrics
+
+    Capture and inference run on background threads after start(); the
+    presentation stage runs in whichever thread calls run().
+    Items handed to the presenter are (frame_index, capture_time, frame, result).
+    If infer_fn raises, the pipeline stops; the exception is kept in .exception and
+    described in .error, and run() returns after presenting what was already inferred.
+    """
+
+    def __init__(self, source, infer_fn=None, queue_size=1, camera=None, on_capture=None):
+        self.source = source
+        self.camera = camera if camera is not None else str(source)
+        self.infer_fn = infer_fn
+        self.on_capture = on_capture
+        self.frames = LatestQueue(queue_size)
+        self.results = LatestQueue(queue_size)
+        self.stats = {name: StageStats(name) for name in ("capture", "inference", "present")}
+        self.error = None
+        self.exception = None
+        self._cap = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def open(self):
+        """Opens the capture device. Returns False (and sets .error) on failure."""
+        if isinstance(self.source, cv2.VideoCapture):
+            self._cap = self.source
+        else:
+            self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            self.error = "Cannot open camera."
+            return False
+        # we drain the device continuously, so a deep driver buffer only adds latency
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return True
+
+    def start(self):
+        if self._cap is None and not self.open():
+            return False
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="aegis-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="aegis-inference", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        log_info("Frame pipeline started.")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self._threads = []
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    def _capture_loop(self):
+        index = 0
+        stats = self.stats["capture"]
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            ret, frame = self._cap.read()
+            if not ret:
+                self.error = "Camera frame not available."
+                log_warn(self.error)
+                self._stop.set()
+                break
+            ts = time.time()
+            if self.on_capture is not None:
+                try:
+                    self.on_capture(frame, ts)
+                except Exception as e:
+                    self.exception = e
+                    self.error = f"Capture hook failed: {e}"
+                    log_error(self.error, camera=self.camera, frame=index, exc_type=type(e).__name__)
+                    self._stop.set()
+                    break
+            self.frames.put((index, ts, frame))
+            dt = time.perf_counter() - t0
+            stats.record(dt)
+            metrics.observe("capture", dt, self.camera)
+            index += 1
+
+    def _inference_loop(self):
+        stats = self.stats["inference"]
+        while not self._stop.is_set():
+            try:
+                index, ts, frame = self.frames.get(timeout=0.5)
+            except Empty:
+                continue
+            t0 = time.perf_counter()
+            try:
+                result = self.infer_fn(frame) if self.infer_fn is not None else None
+            except Exception as e:
+                self.exception = e
+                self.error = f"Inference failed: {e}"
+                log_error(self.error, camera=self.camera, frame=index, exc_type=type(e).__name__)
+                self._stop.set()
+                break
+            stats.record(time.perf_counter() - t0)
+            self.results.put((index, ts, frame, result))
+
+    def run(self, present_fn, keep_running=lambda: True):
+        """
+        Presentation stage: calls present_fn(item) for each new inference result
+        until keep_running() is False or the capture stage stops. Blocks the caller.
+        """
+        stats = self.stats["present"]
+        try:
+            while keep_running() and (self.running or len(self.results)):
+                try:
+                    item = self.results.get(timeout=0.5)
+                except Empty:
+                    continue
+                t0 = time.perf_counter()
+                present_fn(item)
+                dt = time.perf_counter() - t0
+                stats.record(dt)
+                metrics.observe("present", dt, self.camera)
+        finally:
+            self.stop()
+
+    def report(self):
+        """Throughput per stage plus how many stale frames/results were dropped."""
+        out = {name: s.as_dict() for name, s in self.stats.items()}
+        out["capture"]["dropped"] = self.frames.dropped
+        out["inference"]["dropped"] = self.results.dropped
+        return out
@@ -0,0 +1,192 @@
+# preprocess.py
+"""
+Single-pass preprocessing and postprocessing shared by several YOLO models
+looking at the same frames.
+
+ultralytics' predict() letterboxes, normalizes and tensorizes its source on
+every call, so two models on one frame do that work twice. SharedPreprocessor
+letterboxes a frame (or a batch of same-size frames / crops) once into a
+preallocated uint8 canvas, converts it into a preallocated input tensor, runs
+each model's network on that same tensor, and then does confidence filtering
+and NMS for every model and image in one batched pass. Boxes are mapped back
+to source pixels before Detections are built.
+
+Only torch-backend models expose their network (YOLO.model); anything else
+(ONNX / OpenVINO exports, RemoteModel) keeps using predict().
+"""
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from detections import Detections, DETECTION_DTYPE, map_labels
+from metrics import metrics
+
+PAD_VALUE = 114  # ultralytics' letterbox grey
+STRIDE = 32
+
+
+def network_of(model):
+    """The torch nn.Module behind a YOLO (or SharedModel) object, or None if it has none."""
+    try:
+        import torch
+    except ImportError:
+        return None
+    net = getattr(model, "model", None)
+    return net if isinstance(net, torch.nn.Module) else None
+
+
+def letterbox_geometry(shape, imgsz, stride=STRIDE):
+    """(ratio, (new_h, new_w), (H, W), (top, left)) for a minimal-padding letterbox of shape into imgsz."""
+    h, w = shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    H, W = -(-nh // stride) * stride, -(-nw // stride) * stride
+    return r, (nh, nw), (H, W), ((H - nh) // 2, (W - nw) // 2)
+
+
+class _Plan:
+    """Preallocated buffers for one (batch, frame size, imgsz, device, dtype)."""
+
+    def __init__(self, n, shape, imgsz, device, dtype):
+        import torch
+        self.ratio, (self.nh, self.nw), (self.H, self.W), (self.top, self.left) = letterbox_geometry(shape, imgsz)
+        self.shape = shape[:2]
+        self.canvas = np.full((n, self.H, self.W, 3), PAD_VALUE, dtype=np.uint8)  # padding is written once
+        self.host = torch.from_numpy(self.canvas)                                  # shares the canvas memory
+        self.tensor = torch.empty((n, 3, self.H, self.W), dtype=dtype, device=device)
+        self.resize = (self.nh, self.nw) != tuple(self.shape)
+        # a region spanning full canvas rows is contiguous, so cv2 can resize straight into it
+        self.direct = self.left == 0 and self.nw == self.W
+
+
+class SharedPreprocessor:
+    """
+    - conf / iou / max_det: as in predict(); applied per model and image
+    - camera: label for latency metrics
+    - max_plans: buffer sets kept (LRU); autoscaling and ROI batches change the plan key
+    """
+
+    def __init__(self, conf=0.25, iou=0.7, max_det=300, camera=None, max_plans=4):
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.camera = camera
+        self.max_plans = max_plans
+        self._plans = OrderedDict()
+
+    @staticmethod
+    def prepare_network(net):
+        """Eval mode and fused conv+bn, as predict() would do on first use."""
+        net.eval()
+        if hasattr(net, "is_fused") and not net.is_fused():
+            net.fuse(verbose=False)
+        return net
+
+    def supports(self, sources):
+        """One tensor needs every source to have the same shape."""
+        return bool(sources) and all(s.shape == sources[0].shape for s in sources)
+
+    def prepare(self, sources, imgsz, net):
+        """Letterboxes sources (same shape) into the plan's canvas and returns (tensor, plan)."""
+        param = next(net.parameters())
+        key = (len(sources), sources[0].shape[:2], imgsz, param.device, param.dtype)
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+        else:
+            plan = self._plans[key] = _Plan(len(sources), sources[0].shape, imgsz, param.device, param.dtype)
+            if len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        with metrics.timer("preprocess", self.camera, "shared"):
+            t, l = plan.top, plan.left
+            for i, src in enumerate(sources):
+                region = plan.canvas[i, t:t + plan.nh, l:l + plan.nw]
+                if not plan.resize:
+                    np.copyto(region, src)
+                elif plan.direct:
+                    cv2.resize(src, (plan.nw, plan.nh), dst=region, interpolation=cv2.INTER_LINEAR)
+                else:
+                    region[:] = cv2.resize(src, (plan.nw, plan.nh), interpolation=cv2.INTER_LINEAR)
+            host = plan.host if plan.tensor.device.type == "cpu" else plan.host.to(plan.tensor.device,
+                                                                                   non_blocking=True)
+            # BGR HWC uint8 -> RGB CHW float in [0, 1], written into the preallocated tensor
+            for c in range(3):
+                plan.tensor[:, c].copy_(host[..., 2 - c])
+            plan.tensor.mul_(1.0 / 255.0)
+        return plan.tensor, plan
+
+    def forward(self, net, tensor, tag=None):
+        """Raw network output (B, 4 + nc, anchors), boxes as xywh in tensor pixels."""
+        import torch
+        with metrics.timer("predict", self.camera, tag), torch.inference_mode():
+            out = net(tensor)
+        return out[0] if isinstance(out, (list, tuple)) else out
+
+    def postprocess(self, outputs, plan, tables, conf=None):
+        """
+        outputs: raw output per model (same input tensor); tables: (label_table, tag) per model.
+        Confidence filtering and NMS for all models and images run as one batched pass.
+        Returns per model a list (one per source) of Detections in source pixels.
+        """
+        import torch
+        conf = self.conf if conf is None else conf
+        n = plan.tensor.shape[0]
+        n_models = len(outputs)
+        with metrics.timer("nms", self.camera, "shared"):
+            boxes, scores, classes, groups = [], [], [], []
+            for m, out in enumerate(outputs):
+                pred = out.transpose(1, 2)                          # (B, anchors, 4 + nc)
+                score, cls = pred[..., 4:].max(dim=-1)
+                b, a = (score > conf).nonzero(as_tuple=True)
+                xywh = pred[b, a, :4]
+                boxes.append(torch.cat([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, :2] + xywh[:, 2:] / 2], dim=1))
+                scores.append(score[b, a])
+                classes.append(cls[b, a])
+                groups.append(b * n_models + m)                    # one NMS group per (image, model)
+            boxes, scores = torch.cat(boxes).float(), torch.cat(scores).float()
+            classes, groups = torch.cat(classes), torch.cat(groups)
+            n_cls = max(int(out.shape[1]) - 4 for out in outputs)
+            keep = _batched_nms(boxes, scores, groups * n_cls + classes, self.iou)
+
+            boxes = boxes[keep].cpu().numpy()
+            scores = scores[keep].cpu().numpy()
+            classes = classes[keep].cpu().numpy()
+            groups = groups[keep].cpu().numpy()
+            # keep is sorted by score: the first max_det of each group survive
+            order = np.argsort(groups, kind="stable")
+            boxes, scores, classes, groups = boxes[order], scores[order], classes[order], groups[order]
+            starts = np.searchsorted(groups, np.arange(n * n_models))
+            ends = np.searchsorted(groups, np.arange(n * n_models), side="right")
+
+            # letterbox -> source pixels
+            boxes -= np.array([plan.left, plan.top, plan.left, plan.top], dtype=np.float32)
+            boxes /= plan.ratio
+            h, w = plan.shape
+            np.clip(boxes, 0, [w, h, w, h], out=boxes)
+
+            per_model = [[] for _ in range(n_models)]
+            for g in range(n * n_models):
+                m = g % n_models                                   # groups are image-major
+                s, e = starts[g], min(ends[g], starts[g] + self.max_det)
+                data = np.empty(e - s, dtype=DETECTION_DTYPE)
+                data["box"] = boxes[s:e]
+                data["conf"] = scores[s:e]
+                data["cls"] = classes[s:e]
+                table, tag = tables[m]
+                per_model[m].append(Detections(data, map_labels(data["cls"], table, tag)))
+        return per_model
+
+
+def _batched_nms(boxes, scores, idxs, iou):
+    """Class-aware NMS over every group at once; indices sorted by decreasing score."""
+    import torch
+    if boxes.numel() == 0:
+        return torch.zeros(0, dtype=torch.long, device=boxes.device)
+    try:
+        from torchvision.ops import batched_nms
+        return batched_nms(boxes, scores, idxs, iou)
+    except ImportError:
+        from roi import nms
+        keep = nms(boxes.cpu().numpy(), scores.cpu().numpy(), idxs.cpu().numpy(), iou)
+        return torch.from_numpy(keep).to(boxes.device)
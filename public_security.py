@@ -1,79 +1,255 @@
 # public_security.py
-import cv2
+import time
 import numpy as np
-from ultralytics import YOLO
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from aegis_utils import log_info
+from detections import Detections, label_table
+from cadence import CadenceScheduler, ModelCadence
+from backends import export_model, load_model, model_names
+from metrics import metrics
+from annotate import Annotator
+from preprocess import SharedPreprocessor, network_of
+from model_registry import SharedModel
 
 class PublicSecurity:
     """
     Loads two YOLOv8 models and runs them per-frame.
     - fire_model_path: path to your fire.pt
     - violence_model_path: path to your Violence.pt
+    - parallel: run the fire and violence models concurrently (one worker thread each)
+    - cadence: optional {"fire": ModelCadence, "violence": ModelCadence} giving each
+      model its own sampling rate in infer_frame; omitted models run every frame
+    - registry: optional ModelRegistry to share already loaded weights across instances
+    - backend: "torch" (default), "onnx" or "openvino"; .pt weights are exported once and cached
+    - camera: name used to label this stream's latency metrics
+    - roi: optional RoiConfig; models then run on native-resolution crops of the
+      ROI polygons / tiles (batched) instead of the whole downscaled frame
+    - autoscale: optional LatencyAutoscaler; moves this camera between input sizes
+      (and frame strides) to hold its target FPS; current settings in self.scale_status
+    - shared_preprocess: opt-in; letterbox / tensorize each frame once for both models and run
+      their NMS in one batched pass (torch backend; otherwise predict() per model)
     """
 
-    def __init__(self, fire_model_path, violence_model_path, conf=0.25, imgsz=640):
+    def __init__(self, fire_model_path, violence_model_path, conf=0.25, imgsz=640, parallel=True, cadence=None,
+                 registry=None, backend="torch", camera="public", roi=None, autoscale=None,
+                 shared_preprocess=False):
         self.conf = conf
+        self.camera = camera
         self.imgsz = imgsz
-        log_info(f"Loading fire model from: {fire_model_path}")
-        self.fire_model = YOLO(fire_model_path)
-        log_info(f"Loading violence model from: {violence_model_path}")
-        self.violence_model = YOLO(violence_model_path)
+        self.roi = roi
+        self.parallel = parallel
+        self.scheduler = None
+        if cadence:
+            cadence = dict(cadence)
+            for name in ("fire", "violence"):
+                cadence.setdefault(name, ModelCadence())
+            self.scheduler = CadenceScheduler(cadence)
+        self.cadence_status = {}
+        self.autoscale = autoscale.configure(imgsz if roi is None else roi.imgsz, camera) if autoscale else None
+        self.scale_status = self.autoscale.status() if self.autoscale else {}
+        self._last_detections = Detections()
+        self.registry = registry
+        self.backend = backend
+        log_info(f"Loading fire model from: {fire_model_path} (backend={backend})")
+        self.fire_model = self._load(fire_model_path)
+        log_info(f"Loading violence model from: {violence_model_path} (backend={backend})")
+        self.violence_model = self._load(violence_model_path)
 
-        # get class name mappings (YOLOv8 stores them)
+        # get class name mappings (YOLOv8 stores them; exported models use the export sidecar)
         try:
-            self.fire_names = self.fire_model.model.names
+            self.fire_names = model_names(self.fire_model, fire_model_path, backend)
         except Exception:
             self.fire_names = {0: "fire"}
         try:
-            self.violence_names = self.violence_model.model.names
+            self.violence_names = model_names(self.violence_model, violence_model_path, backend)
         except Exception:
             self.violence_names = {0: "NonViolence", 1: "Violence"}
+        self._label_tables = {}  # (tag, id(names_map)) -> vectorized label lookup
+
+        # both networks read one preprocessed tensor when their torch modules are reachable
+        self.shared = None
+        models = {"fire": self.fire_model, "violence": self.violence_model}
+        self._nets = {tag: network_of(m) for tag, m in models.items()}
+        # registry models are shared: they come prepared, and their networks run under the predict lock
+        self._net_locks = {tag: m.lock if isinstance(m, SharedModel) else nullcontext() for tag, m in models.items()}
+        if shared_preprocess and all(n is not None for n in self._nets.values()):
+            for tag, net in self._nets.items():
+                if not isinstance(models[tag], SharedModel):
+                    SharedPreprocessor.prepare_network(net)
+            self.shared = SharedPreprocessor(conf=conf, camera=camera)
+        self.annotator = Annotator(camera=camera)
+
+        # torch releases the GIL inside its kernels, so two threads give real overlap
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="aegis-public") if parallel else None
+
+    def _load(self, path):
+        if self.registry is not None:
+            return self.registry.acquire(export_model(path, self.backend, imgsz=self.imgsz))
+        return load_model(path, self.backend, imgsz=self.imgsz)
+
+    def _table(self, names_map, tag):
+        key = (tag, id(names_map))
+        table = self._label_tables.get(key)
+        if table is None:
+            table = self._label_tables[key] = label_table(names_map, tag)
+        return table
 
     def _parse_results(self, results, names_map, tag):
         """
         results: list of Results from ultralytics predict
-        returns list of detections: dicts with label, conf, box
+        returns Detections (iterates as dicts with label, conf, box)
         """
-        detections = []
-        for r in results:
-            boxes = getattr(r, "boxes", None)
-            if boxes is None:
-                continue
-            # boxes is a Boxes object; iterate per box
-            for i in range(len(boxes.xyxy)):
-                xyxy = boxes.xyxy[i].cpu().numpy().astype(int).tolist()  # [x1,y1,x2,y2]
-                conf = float(boxes.conf[i].cpu().numpy())
-                cls_id = int(boxes.cls[i].cpu().numpy())
-                label = names_map.get(cls_id, str(cls_id)) if isinstance(names_map, dict) else names_map[cls_id]
-                detections.append({
-                    "label": f"{tag}:{label}",
-                    "conf": conf,
-                    "box": xyxy
-                })
-        return detections
-
-    def infer_frame(self, frame):
+        table = self._table(names_map, tag)
+        with metrics.timer("parse", self.camera, tag):
+            return Detections.from_results(results, table, tag)
+
+    def _frame_detections(self, per_source, shape):
+        """Detections for one frame from its per-source Detections (one per ROI crop when tiling)."""
+        if self.roi is None:
+            return per_source[0]
+        return self.roi.merge(per_source, shape)
+
+    def _sources(self, frame):
+        """What the models see for a frame: the frame itself, or its ROI crops."""
+        return [frame] if self.roi is None else self.roi.cut(frame)
+
+    def _imgsz(self):
+        if self.autoscale is not None:
+            return self.autoscale.imgsz
+        return self.imgsz if self.roi is None else self.roi.imgsz
+
+    def _run_model(self, model, tag, source):
+        if isinstance(source, list) and not source:
+            return []  # ROI masks out the whole frame
+        # using predict ensures we can pass conf and imgsz
+        with metrics.timer("predict", self.camera, tag):
+            results = model.predict(source=source, conf=self.conf, imgsz=self._imgsz(), verbose=False)
+        metrics.observe_results(results, self.camera, tag)
+        return results
+
+    def _predict_both(self, source, run_fire=True, run_violence=True):
         """
-        frame: BGR numpy array
-        returns annotated_frame (BGR), detections (list)
+        Runs fire and violence models on the same source (a frame or a list of frames / crops).
+        Returns (res_fire, res_violence), each a list of Results in source order,
+        or None for a model that was not asked to run.
         """
-        # run both models
-        # using predict ensures we can pass conf and imgsz
-        res_fire = self.fire_model.predict(source=frame, conf=self.conf, imgsz=self.imgsz)
-        res_violence = self.violence_model.predict(source=frame, conf=self.conf, imgsz=self.imgsz)
+        if self._executor is None or not (run_fire and run_violence):
+            res_fire = self._run_model(self.fire_model, "fire", source) if run_fire else None
+            res_violence = self._run_model(self.violence_model, "violence", source) if run_violence else None
+            return res_fire, res_violence
 
-        dets_fire = self._parse_results(res_fire, self.fire_names, "fire")
-        dets_violence = self._parse_results(res_violence, self.violence_names, "violence")
+        fut_fire = self._executor.submit(self._run_model, self.fire_model, "fire", source)
+        fut_violence = self._executor.submit(self._run_model, self.violence_model, "violence", source)
+        return fut_fire.result(), fut_violence.result()
+
+    def _infer_shared(self, sources, tags):
+        """One letterbox / tensor for all sources, each due network on it, one NMS pass for all."""
+        shared = self.shared
+        tensor, plan = shared.prepare(sources, self._imgsz(), self._nets[tags[0]])
+        if self._executor is not None and len(tags) > 1:
+            futures = [self._executor.submit(self._forward, t, tensor) for t in tags]
+            outputs = [f.result() for f in futures]
+        else:
+            outputs = [self._forward(t, tensor) for t in tags]
+        names = {"fire": self.fire_names, "violence": self.violence_names}
+        tables = [(self._table(names[t], t), t) for t in tags]
+        per_model = dict(zip(tags, shared.postprocess(outputs, plan, tables, conf=self.conf)))
+        return per_model.get("fire"), per_model.get("violence")
+
+    def _forward(self, tag, tensor):
+        with self._net_locks[tag]:
+            return self.shared.forward(self._nets[tag], tensor, tag)
+
+    def _infer_sources(self, sources, run_fire=True, run_violence=True):
+        """
+        sources: list of frames / crops. Returns (fire, violence), each a list of
+        Detections aligned with sources, or None for a model that was not asked to run.
+        """
+        tags = [t for t, run in (("fire", run_fire), ("violence", run_violence)) if run]
+        if not sources or not tags:
+            return ([] if run_fire else None), ([] if run_violence else None)
+        if self.shared is not None and self.shared.supports(sources):
+            return self._infer_shared(sources, tags)
+        # different source shapes, or models without a reachable torch network
+        res_fire, res_violence = self._predict_both(sources, run_fire, run_violence)
+        return (None if res_fire is None else [self._parse_results([r], self.fire_names, "fire") for r in res_fire],
+                None if res_violence is None else
+                [self._parse_results([r], self.violence_names, "violence") for r in res_violence])
+
+    def infer_frame(self, frame, render=False):
+        """
+        frame: BGR numpy array
+        returns annotated_frame (BGR, or None unless render=True), detections (Detections, iterates as dicts)
+        Headless callers skip rendering entirely; display paths can also render later
+        with self.annotator (or their own Annotator) only for frames they show.
+        With a cadence, each detection carries "fresh" (False = carried over from the
+        model's last run) and self.cadence_status describes every model for this frame.
+        With autoscale, self.scale_status holds the input size / stride used; frames
+        skipped by the stride return the previous detections (not fresh).
+        """
+        scaler = self.autoscale
+        if scaler is not None and not scaler.due():
+            self.scale_status = scaler.status()
+            detections = self._last_detections.stale()
+            return (self.annotator.render(frame, detections) if render else None), detections
+        t0 = time.perf_counter()
+        source = self._sources(frame)
+        shape = frame.shape
+        sched = self.scheduler
+        if sched is None:
+            per_fire, per_violence = self._infer_sources(source)
+            dets_fire = self._frame_detections(per_fire, shape)
+            dets_violence = self._frame_detections(per_violence, shape)
+        else:
+            sched.tick()
+            per_fire, per_violence = self._infer_sources(source, sched.due("fire"), sched.due("violence"))
+            if per_fire is not None:
+                sched.update("fire", self._frame_detections(per_fire, shape))
+            if per_violence is not None:
+                sched.update("violence", self._frame_detections(per_violence, shape))
+            dets_fire, dets_violence = sched.detections("fire"), sched.detections("violence")
+            self.cadence_status = sched.status()
 
         detections = dets_fire + dets_violence
+        if scaler is not None:
+            scaler.observe(time.perf_counter() - t0)
+            self.scale_status = scaler.status()
+            self._last_detections = detections
+        return (self.annotator.render(frame, detections) if render else None), detections
+
+    def infer_batch(self, frames, render=False):
+        """
+        frames: list of BGR numpy arrays (e.g. one per camera, or consecutive frames)
+        Runs a single batched predict per model (every model, regardless of cadence).
+        returns list of (annotated_frame or None, detections), in the same order as frames
+        """
+        if not frames:
+            return []
+        t0 = time.perf_counter()
+        # one batched call per model over every frame (or every ROI crop of every frame)
+        sources = [self._sources(f) for f in frames]
+        per_fire, per_violence = self._infer_sources([s for per_frame in sources for s in per_frame])
 
-        # annotate
-        annotated = frame.copy()
-        for d in detections:
-            x1, y1, x2, y2 = d["box"]
-            label_text = f"{d['label']} {d['conf']:.2f}"
-            color = (0, 0, 255) if d["label"].startswith("fire") else (0, 165, 255)  # red for fire, orange for violence
-            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(annotated, label_text, (x1, y1 - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+        outputs, i = [], 0
+        for frame, per_frame in zip(frames, sources):
+            j = i + len(per_frame)
+            detections = (self._frame_detections(per_fire[i:j], frame.shape)
+                          + self._frame_detections(per_violence[i:j], frame.shape))
+            outputs.append(((self.annotator.render(frame, detections) if render else None), detections))
+            i = j
+        if self.autoscale is not None:
+            # every frame of a batch is inferred: only the input size adapts, on per-frame latency
+            self.autoscale.observe((time.perf_counter() - t0) / len(frames))
+            self.scale_status = self.autoscale.status()
+        return outputs
 
-        return annotated, detections
+    def close(self):
+        """Shuts down the worker threads used for parallel inference and releases registry leases."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self.registry is not None:
+            self.registry.release(self.fire_model)
+            self.registry.release(self.violence_model)
+            self.registry = None
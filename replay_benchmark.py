@@ -0,0 +1,280 @@
+# replay_benchmark.py
+"""
+Offline replay benchmark for the detection pipelines.
+
+Replays video files or a synthetic frame stream through
+PublicSecurity.infer_frame and HomeSecurity.process_frame for every
+imgsz x conf combination and writes FPS, per-stage p50/p95/p99 latency,
+peak RSS and alert-write time as JSON, so runs can be compared across commits.
+Each configuration runs in a fresh process, so its peak RSS is its own and
+not the high-water mark of every configuration before it.
+
+No webcam or network is needed: by default both pipelines use randomly
+initialized yolov8n models built from the ultralytics yaml.
+
+    python replay_benchmark.py --source synthetic --frames 200 --imgsz 320 640 --conf 0.25 --out bench.json
+    python replay_benchmark.py --source clip1.mp4 clip2.mp4 --public-weights fire.pt Violence.pt
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+# keep ultralytics from reaching out for settings sync / update checks
+os.environ.setdefault("YOLO_OFFLINE", "1")
+
+RANDOM_MODEL = "yolov8n.yaml"  # architecture only: random weights, nothing downloaded
+
+
+class StageTimer:
+    """Collects latency samples per named stage."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def add(self, stage, seconds):
+        self.samples[stage].append(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - t0)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            with self.time(stage):
+                return fn(*args, **kwargs)
+        return timed
+
+    def summary(self):
+        out = {}
+        for stage, s in self.samples.items():
+            ms = np.asarray(s) * 1000.0
+            out[stage] = {
+                "n": int(ms.size),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            }
+        return out
+
+
+class _TimedModel:
+    """Proxy that times predict() and passes everything else through."""
+
+    def __init__(self, model, timer, stage):
+        self._model = model
+        self.predict = timer.wrap(stage, model.predict)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1)
+        except Exception:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def git_commit():
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=here,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def synthetic_stream(n, h=480, w=640, seed=0):
+    """Noisy static background with a moving bright block, so motion and detectors have something to do."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 80, size=(h, w, 3), dtype=np.uint8)
+    for i in range(n):
+        frame = background.copy()
+        x = (i * 7) % max(1, w - 120)
+        y = h // 3 + int(40 * np.sin(i / 10.0))
+        frame[y:y + 120, x:x + 80] = (30, 120, 240)
+        yield frame
+
+
+def video_stream(path, n):
+    cap = cv2.VideoCapture(path)
+    try:
+        count = 0
+        while n is None or count < n:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+            count += 1
+    finally:
+        cap.release()
+
+
+def frame_stream(source, n, timer):
+    """Yields frames from source ("synthetic" or a video path), timing decode per frame."""
+    gen = synthetic_stream(n) if source == "synthetic" else video_stream(source, n)
+    while True:
+        with timer.time("decode"):
+            frame = next(gen, None)
+        if frame is None:
+            return
+        yield frame
+
+
+def bench_public(source, n, imgsz, conf, fire_path, violence_path):
+    from public_security import PublicSecurity
+
+    timer = StageTimer()
+    ps = PublicSecurity(fire_path, violence_path, conf=conf, imgsz=imgsz)
+    ps.fire_model = _TimedModel(ps.fire_model, timer, "fire_predict")
+    ps.violence_model = _TimedModel(ps.violence_model, timer, "violence_predict")
+    ps._parse_results = timer.wrap("parse", ps._parse_results)
+    if ps.shared is not None:
+        # single-pass path: one letterbox, both networks on the same tensor, one NMS
+        ps.shared.prepare = timer.wrap("preprocess", ps.shared.prepare)
+        ps.shared.forward = timer.wrap("forward", ps.shared.forward)
+        ps.shared.postprocess = timer.wrap("nms", ps.shared.postprocess)
+
+    frames = 0
+    t0 = time.perf_counter()
+    for frame in frame_stream(source, n, timer):
+        with timer.time("total"):
+            _, dets = ps.infer_frame(frame)
+        # rendering is optional (display / save only), so it is timed outside "total"
+        with timer.time("annotate"):
+            ps.annotator.render_into(frame, dets)
+        frames += 1
+    wall = time.perf_counter() - t0
+    ps.close()
+    return {"frames": frames, "fps": round(frames / wall, 2) if wall else 0.0, "stages": timer.summary()}
+
+
+def bench_home(source, n, imgsz, conf, home_path):
+    from home_security import HomeSecurity
+
+    timer = StageTimer()
+    hs = HomeSecurity(model_path=home_path, conf=conf, imgsz=imgsz)
+    hs.model = _TimedModel(hs.model, timer, "predict")
+    hs._parse_results = timer.wrap("parse", hs._parse_results)
+
+    frames, alerts = 0, []
+    t0 = time.perf_counter()
+    for frame in frame_stream(source, n, timer):
+        with timer.time("total"):
+            _, dets, info = hs.process_frame(frame)
+        with timer.time("annotate"):
+            hs.annotator.render_into(frame, dets)
+        if info.get("job") is not None:
+            alerts.append((time.perf_counter(), info["job"]))
+        frames += 1
+    wall = time.perf_counter() - t0
+
+    # time one alert write of a full buffer explicitly, so every run reports it
+    if len(hs.frame_buffer):
+        t_submit = time.perf_counter()
+        job = hs.alert_writer.submit(hs.frame_buffer.handoff(), "alerts/bench_alert.mp4", "alerts/bench_alert.jpg",
+                                     fps=hs.fps)
+        if job is not None:
+            job.result()
+            timer.add("alert_write", time.perf_counter() - t_submit)
+    for t_submit, job in alerts:
+        job.result()
+    hs.close()
+    return {"frames": frames, "fps": round(frames / wall, 2) if wall else 0.0,
+            "alerts_triggered": len(alerts), "stages": timer.summary()}
+
+
+def _bench_one(pipeline, source, n, imgsz, conf, fire_path, violence_path, home_path):
+    """One configuration; runs in its own process so peak_rss_mb covers only this configuration."""
+    if pipeline == "public":
+        r = bench_public(source, n, imgsz, conf, fire_path, violence_path)
+    else:
+        r = bench_home(source, n, imgsz, conf, home_path)
+    r["peak_rss_mb"] = peak_rss_mb()
+    return r
+
+
+def run(sources, n, imgsz_list, conf_list, pipelines, fire_path, violence_path, home_path):
+    results = []
+    ctx = mp.get_context("spawn")  # a fresh interpreter: no memory high-water mark inherited
+    for source in sources:
+        for imgsz in imgsz_list:
+            for conf in conf_list:
+                for pipeline in pipelines:
+                    with ctx.Pool(1) as pool:
+                        r = pool.apply(_bench_one, (pipeline, source, n, imgsz, conf,
+                                                    fire_path, violence_path, home_path))
+                    r.update({"pipeline": pipeline, "source": source, "imgsz": imgsz, "conf": conf})
+                    print(f"{pipeline:>6} {os.path.basename(source):>16} imgsz={imgsz:<4} conf={conf:<5} "
+                          f"{r['fps']:7.2f} FPS  total p95={r['stages'].get('total', {}).get('p95_ms', 0):.1f} ms  "
+                          f"rss={r['peak_rss_mb']} MB")
+                    results.append(r)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay benchmark for Aegis detection pipelines")
+    ap.add_argument("--source", nargs="+", default=["synthetic"], help="video files, or 'synthetic'")
+    ap.add_argument("--frames", type=int, default=150, help="frames per source (videos: max)")
+    ap.add_argument("--imgsz", type=int, nargs="+", default=[320, 640])
+    ap.add_argument("--conf", type=float, nargs="+", default=[0.25])
+    ap.add_argument("--pipelines", nargs="+", choices=["public", "home"], default=["public", "home"])
+    ap.add_argument("--public-weights", nargs=2, default=[RANDOM_MODEL, RANDOM_MODEL], metavar=("FIRE", "VIOLENCE"))
+    ap.add_argument("--home-weights", default=RANDOM_MODEL)
+    ap.add_argument("--out", default="bench_results.json")
+    args = ap.parse_args()
+
+    def resolve(p):
+        return p if p in ("synthetic", RANDOM_MODEL) else os.path.abspath(p)
+
+    # alerts/ is written relative to the cwd, so replay inside a scratch directory
+    sources = [resolve(s) for s in args.source]
+    fire_path, violence_path = (resolve(p) for p in args.public_weights)
+    home_path = resolve(args.home_weights)
+    out_path = os.path.abspath(args.out)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="aegis-bench-") as scratch:
+        os.chdir(scratch)
+        try:
+            results = run(sources, args.frames, args.imgsz, args.conf, args.pipelines,
+                          fire_path, violence_path, home_path)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
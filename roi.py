@@ -0,0 +1,126 @@
+# roi.py
+"""
+Region-of-interest and tiled inference for high-resolution cameras.
+
+Instead of shrinking a whole 4K frame to imgsz, the frame is cut into
+native-resolution crops (tiles over the configured ROI polygons, or over the
+whole frame), the crops are run through the model as one batch, and tile
+detections are shifted back to frame coordinates and merged with a
+cross-tile NMS. Tiles that do not touch any ROI polygon (sky, walls) are
+never inferred.
+"""
+import cv2
+import numpy as np
+
+from detections import Detections, box_iou
+
+
+def _grid(start, stop, tile, step):
+    """Tile origins covering [start, stop) with the last tile flush to the end."""
+    if stop - start <= tile:
+        return [start]
+    origins = list(range(start, stop - tile, step))
+    origins.append(stop - tile)
+    return origins
+
+
+def nms(boxes, scores, classes, iou_threshold=0.5):
+    """Per-class greedy NMS; returns kept indices (highest score first)."""
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-scores)
+    iou = box_iou(boxes[order], boxes[order])
+    same = classes[order][:, None] == classes[order][None, :]
+    suppress = (iou > iou_threshold) & same
+    keep = np.ones(len(order), dtype=bool)
+    for i in range(len(order)):
+        if keep[i]:
+            keep[i + 1:] &= ~suppress[i, i + 1:]
+    return order[keep]
+
+
+class RoiConfig:
+    """
+    - polygons: list of [(x, y), ...] in full-frame pixels to watch; None = whole frame
+    - tile: crop size in pixels; crops are inferred at this size, i.e. at native resolution
+    - overlap: fractional overlap between neighbouring tiles, so objects on a seam are seen whole
+    - iou_threshold: cross-tile NMS threshold when merging
+    - min_coverage: skip tiles whose area inside the ROI is below this fraction
+    """
+
+    def __init__(self, polygons=None, tile=640, overlap=0.2, iou_threshold=0.5, min_coverage=0.01):
+        self.polygons = [np.asarray(p, dtype=np.int32) for p in polygons] if polygons else None
+        self.tile = int(tile)
+        self.overlap = overlap
+        self.iou_threshold = iou_threshold
+        self.min_coverage = min_coverage
+        self._plan_shape = None
+        self._crops = None
+        self._mask = None
+
+    def _build_mask(self, h, w):
+        if self.polygons is None:
+            return None
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.fillPoly(mask, self.polygons, 1)
+        return mask
+
+    def crops(self, shape):
+        """[(x0, y0, x1, y1)] to infer for frames of this shape; cached per frame size."""
+        h, w = shape[:2]
+        if self._plan_shape == (h, w):
+            return self._crops
+        self._mask = self._build_mask(h, w)
+        tile = min(self.tile, h, w)
+        step = max(1, int(tile * (1.0 - self.overlap)))
+        if self._mask is not None:
+            ys, xs = np.nonzero(self._mask)
+            if len(xs) == 0:
+                self._plan_shape, self._crops = (h, w), []
+                return self._crops
+            # only tile the ROIs' bounding box, not the whole frame
+            bx0, by0 = int(xs.min()), int(ys.min())
+            bx1, by1 = int(xs.max()) + 1, int(ys.max()) + 1
+            bx0, bx1 = max(0, min(bx0, bx1 - tile)), max(bx1, bx0 + tile)
+            by0, by1 = max(0, min(by0, by1 - tile)), max(by1, by0 + tile)
+            bx1, by1 = min(bx1, w), min(by1, h)
+        else:
+            bx0, by0, bx1, by1 = 0, 0, w, h
+        crops = []
+        for y0 in _grid(by0, by1, tile, step):
+            for x0 in _grid(bx0, bx1, tile, step):
+                if self._mask is not None:
+                    coverage = self._mask[y0:y0 + tile, x0:x0 + tile].mean()
+                    if coverage < self.min_coverage:
+                        continue  # masked-out area: never inferred
+                crops.append((x0, y0, x0 + tile, y0 + tile))
+        self._plan_shape, self._crops = (h, w), crops
+        return crops
+
+    @property
+    def imgsz(self):
+        return self.tile
+
+    def cut(self, frame):
+        """Crop views (no copies) for this frame, in crops() order."""
+        return [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in self.crops(frame.shape)]
+
+    def merge(self, per_crop, shape):
+        """Shifts per-crop Detections to frame coordinates, drops those outside the ROI and runs cross-tile NMS."""
+        crops = self.crops(shape)
+        parts = []
+        for dets, (x0, y0, _, _) in zip(per_crop, crops):
+            if len(dets):
+                data = dets.data.copy()
+                data["box"] += np.array([x0, y0, x0, y0], dtype=np.int32)
+                parts.append(Detections(data, dets.labels, dets.fresh))
+        merged = Detections.concat(parts)
+        if not len(merged):
+            return merged
+        if self._mask is not None:
+            cx = ((merged.boxes[:, 0] + merged.boxes[:, 2]) // 2).clip(0, shape[1] - 1)
+            cy = ((merged.boxes[:, 1] + merged.boxes[:, 3]) // 2).clip(0, shape[0] - 1)
+            merged = merged.select(self._mask[cy, cx] > 0)
+        if len(parts) > 1 and len(merged):
+            merged = merged.select(nms(merged.boxes.astype(np.float32), merged.confs, merged.cls, self.iou_threshold))
+        return merged
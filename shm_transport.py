@@ -0,0 +1,334 @@
+# shm_transport.py
+"""
+Multi-process, multi-camera frame transport over shared memory.
+
+Capture processes decode straight into slots of a per-camera shared-memory
+ring; inference processes read the newest slot in place (no pickling, no
+copy) and send only the small detection arrays back over a control queue.
+Every process has its own GIL, so capture, inference and the UI stop
+contending for one interpreter and the box's cores can all be used. Each
+inference worker is pinned to its own share of the cores with matching
+torch / OpenCV thread counts, and serves its cameras by priority (see
+inference_scheduler); results report queue wait and compute time separately.
+
+    hub = MultiCameraHub([
+        {"name": "gate", "source": "rtsp://...", "mode": "public"},
+        {"name": "lobby", "source": 0, "mode": "home", "priority": 1},
+    ], inference_workers=4, public_kwargs={...})
+    hub.start()
+    for result in hub.results():
+        ...
+"""
+import copy
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from aegis_utils import log_info, log_warn
+from inference_scheduler import URGENT_LABELS, PriorityPicker, apply_worker_limits, log_plan, plan_cores
+from metrics import metrics
+
+FREE, WRITING, READY, READING = 0, 1, 2, 3
+
+
+class CameraRing:
+    """
+    Shared-memory ring of frames for one camera.
+      frames: (slots, H, W, C) uint8
+      meta:   int64 [latest_slot, latest_seq, state[slots], seq[slots]]
+      stamps: float64 capture time per slot
+    A process-shared lock guards only the slot bookkeeping; frame bytes are
+    written and read outside it.
+    """
+
+    def __init__(self, name, shape, slots=4, lock=None, create=False):
+        self.name = name
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.lock = lock
+        frame_bytes = int(np.prod((slots,) + self.shape))
+        meta_len = 2 + 2 * slots
+        self._shm_frames = shared_memory.SharedMemory(name=f"{name}_f", create=create, size=frame_bytes)
+        self._shm_meta = shared_memory.SharedMemory(name=f"{name}_m", create=create, size=8 * meta_len + 8 * slots)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self._shm_frames.buf)
+        self.meta = np.ndarray((meta_len,), dtype=np.int64, buffer=self._shm_meta.buf)
+        self.stamps = np.ndarray((slots,), dtype=np.float64, buffer=self._shm_meta.buf, offset=8 * meta_len)
+        if create:
+            self.meta[:] = 0
+            self.meta[0] = -1
+            self.stamps[:] = 0.0
+
+    def spec(self):
+        """Picklable description used to attach from another process."""
+        return {"name": self.name, "shape": self.shape, "slots": self.slots, "lock": self.lock}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec["name"], spec["shape"], spec["slots"], spec["lock"], create=False)
+
+    def _state(self, slot):
+        return self.meta[2 + slot]
+
+    def _set_state(self, slot, value):
+        self.meta[2 + slot] = value
+
+    # writer side ------------------------------------------------------
+    def begin_write(self):
+        """Claims a slot that is neither the newest frame nor being read. Returns (slot, view) or (None, None)."""
+        with self.lock:
+            latest = self.meta[0]
+            for slot in range(self.slots):
+                if slot != latest and self._state(slot) in (FREE, READY):
+                    self._set_state(slot, WRITING)
+                    return slot, self.frames[slot]
+        return None, None
+
+    def commit(self, slot, stamp):
+        with self.lock:
+            seq = self.meta[1] + 1
+            prev = self.meta[0]
+            if prev >= 0 and self._state(prev) == READY:
+                self._set_state(prev, FREE)  # superseded: latest frame wins
+            self.meta[1] = seq
+            self.meta[2 + self.slots + slot] = seq
+            self.stamps[slot] = stamp
+            self._set_state(slot, READY)
+            self.meta[0] = slot
+
+    # reader side ------------------------------------------------------
+    def peek(self, after_seq=0):
+        """Capture stamp of the newest frame if its seq > after_seq, else None; claims nothing."""
+        with self.lock:
+            slot = self.meta[0]
+            if slot < 0 or self.meta[1] <= after_seq or self._state(slot) != READY:
+                return None
+            return float(self.stamps[slot])
+
+    def acquire_latest(self, after_seq=0):
+        """Newest frame with seq > after_seq as (slot, seq, stamp, view), read in place; or None."""
+        with self.lock:
+            slot = self.meta[0]
+            if slot < 0 or self.meta[1] <= after_seq or self._state(slot) != READY:
+                return None
+            self._set_state(slot, READING)
+            return int(slot), int(self.meta[2 + self.slots + slot]), float(self.stamps[slot]), self.frames[slot]
+
+    def release(self, slot):
+        with self.lock:
+            self._set_state(slot, READY if self.meta[0] == slot else FREE)
+
+    def close(self, unlink=False):
+        self.frames = self.meta = self.stamps = None
+        self._shm_frames.close()
+        self._shm_meta.close()
+        if unlink:
+            self._shm_frames.unlink()
+            self._shm_meta.unlink()
+
+
+def _capture_main(camera, ring_spec, stop, cores=None):
+    apply_worker_limits(cores, cv_threads=1, use_torch=False)
+    import cv2
+    ring = CameraRing.attach(ring_spec)
+    h, w = ring.shape[:2]
+    cap = cv2.VideoCapture(camera["source"])
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, w)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+    try:
+        while not stop.is_set():
+            slot, view = ring.begin_write()
+            if slot is None:
+                time.sleep(0.001)  # every slot busy; readers will free one shortly
+                continue
+            ret, frame = cap.read(view)
+            if not ret:
+                log_warn(f"[{camera['name']}] capture ended", camera=camera["name"])
+                break
+            if frame is not view:
+                # backend returned its own buffer (or another size): copy / resize into the slot
+                if frame.shape != view.shape:
+                    frame = cv2.resize(frame, (w, h))
+                np.copyto(view, frame)
+            ring.commit(slot, time.time())
+    finally:
+        cap.release()
+        ring.close()
+
+
+def _build_detector(camera, public_kwargs, home_kwargs):
+    kwargs = dict(public_kwargs if camera["mode"] == "public" else home_kwargs)
+    if kwargs.get("autoscale") is not None:
+        kwargs["autoscale"] = copy.deepcopy(kwargs["autoscale"])  # controller state is per camera
+    if camera["mode"] == "public":
+        from public_security import PublicSecurity
+        # the worker's torch pool already spans its cores; two concurrent predicts would run 2x threads
+        kwargs["parallel"] = False
+        return PublicSecurity(camera=camera["name"], **kwargs)
+    from home_security import HomeSecurity
+    return HomeSecurity(camera=camera["name"], **kwargs)
+
+
+def _inference_main(worker_id, cameras, ring_specs, results, stop, public_kwargs, home_kwargs, cores, threads,
+                    urgent_labels=URGENT_LABELS):
+    # before torch is imported, so its thread pool starts pinned and sized
+    apply_worker_limits(cores, torch_threads=threads, cv_threads=1)
+    rings = {c["name"]: CameraRing.attach(ring_specs[c["name"]]) for c in cameras}
+    detectors = {c["name"]: _build_detector(c, public_kwargs, home_kwargs) for c in cameras}
+    modes = {c["name"]: c["mode"] for c in cameras}
+    last_seq = {c["name"]: 0 for c in cameras}
+    picker = PriorityPicker({c["name"]: c.get("priority", 0) for c in cameras}, urgent_labels=urgent_labels)
+    log_info(f"Inference worker {worker_id} serving {sorted(rings)}")
+    try:
+        while not stop.is_set():
+            # every camera with an unserved frame competes; the picker decides who goes first
+            pending = {}
+            for name, ring in rings.items():
+                stamp = ring.peek(last_seq[name])
+                if stamp is not None:
+                    pending[name] = stamp
+            name = picker.pick(pending)
+            if name is None:
+                time.sleep(0.002)
+                continue
+            got = rings[name].acquire_latest(last_seq[name])
+            if got is None:
+                continue
+            slot, seq, stamp, view = got
+            start = time.time()
+            try:
+                if modes[name] == "public":
+                    _, dets = detectors[name].infer_frame(view)
+                    info = {"scale": detectors[name].scale_status}
+                else:
+                    _, dets, info = detectors[name].process_frame(view)
+                    info = {k: v for k, v in info.items() if k != "job"}  # keep it picklable
+            finally:
+                rings[name].release(slot)
+            done = time.time()
+            last_seq[name] = seq
+            picker.update(name, dets.labels[dets.fresh], info.get("triggered", False))
+            try:
+                results.put_nowait({"camera": name, "seq": seq, "stamp": stamp, "data": dets.data,
+                                    "labels": dets.labels, "fresh": dets.fresh, "info": info,
+                                    "latency_s": done - stamp, "wait_s": start - stamp, "compute_s": done - start,
+                                    "priority": picker.priority(name), "worker": worker_id})
+            except queue.Full:
+                pass  # consumer is behind; newer results will follow
+    finally:
+        for d in detectors.values():
+            d.close()
+        for r in rings.values():
+            r.close()
+
+
+class MultiCameraHub:
+    """
+    cameras: list of {"name", "source", "mode": "public"|"home", "shape": (H, W, 3) optional,
+              "priority": int optional (higher is served first by its worker)}
+    inference_workers: processes running detectors; cameras are spread round-robin,
+      highest priority first, and stay with their worker (detectors keep per-camera state)
+    public_kwargs / home_kwargs: constructor arguments for PublicSecurity / HomeSecurity
+    reserve_cores: cores kept free of inference workers for capture processes / UI; the rest are
+      split between workers
+    torch_threads: intra-op threads per worker (None = one per core of its share)
+    pin: pin inference workers to their cores (False = only size the thread pools)
+    pin_capture: also pin capture processes to the reserved cores, which are then sized to at least
+      one per camera; by default capture is left to the OS scheduler
+    urgent_labels: detection labels that raise a camera's priority while freshly detected (see PriorityPicker)
+    """
+
+    def __init__(self, cameras, inference_workers=None, slots=4, public_kwargs=None, home_kwargs=None,
+                 result_queue_size=1024, reserve_cores=1, torch_threads=None, pin=True, pin_capture=False,
+                 urgent_labels=URGENT_LABELS):
+        self.cameras = [dict(c, shape=tuple(c.get("shape", (480, 640, 3)))) for c in cameras]
+        cpus = mp.cpu_count()
+        self.inference_workers = max(1, min(inference_workers or max(1, cpus // 2), len(self.cameras)))
+        self.slots = slots
+        self.public_kwargs = public_kwargs or {}
+        self.home_kwargs = home_kwargs or {}
+        self.reserve_cores = reserve_cores
+        self.torch_threads = torch_threads
+        self.pin = pin
+        self.pin_capture = pin_capture
+        self.urgent_labels = tuple(urgent_labels)
+        self._ctx = mp.get_context("spawn")  # torch / OpenCV state must not be forked
+        self._stop = self._ctx.Event()
+        self._results = self._ctx.Queue(result_queue_size)
+        self._rings = {}
+        self._procs = []
+
+    def start(self):
+        prefix = f"aegis{mp.current_process().pid}"
+        for i, cam in enumerate(self.cameras):
+            ring = CameraRing(f"{prefix}_{i}", cam["shape"], self.slots, lock=self._ctx.Lock(), create=True)
+            self._rings[cam["name"]] = ring
+        specs = {name: ring.spec() for name, ring in self._rings.items()}
+
+        # one decoding process per camera does not fit on a single reserved core
+        reserve = max(self.reserve_cores, len(self.cameras)) if self.pin_capture else self.reserve_cores
+        reserved, per_worker = plan_cores(self.inference_workers, reserve)
+        threads = [self.torch_threads or len(cores) for cores in per_worker]
+        log_plan(reserved, per_worker, threads)
+        if not (self.pin and self.pin_capture):
+            reserved = None
+        if not self.pin:
+            per_worker = [None] * self.inference_workers
+
+        for cam in self.cameras:
+            p = self._ctx.Process(target=_capture_main, args=(cam, specs[cam["name"]], self._stop, reserved),
+                                  name=f"aegis-capture-{cam['name']}", daemon=True)
+            self._procs.append(p)
+        # spread high-priority cameras across workers first
+        by_priority = sorted(self.cameras, key=lambda c: -c.get("priority", 0))
+        for w in range(self.inference_workers):
+            assigned = by_priority[w::self.inference_workers]
+            p = self._ctx.Process(target=_inference_main,
+                                  args=(w, assigned, {c["name"]: specs[c["name"]] for c in assigned}, self._results,
+                                        self._stop, self.public_kwargs, self.home_kwargs, per_worker[w], threads[w],
+                                        self.urgent_labels),
+                                  name=f"aegis-infer-{w}", daemon=True)
+            self._procs.append(p)
+        for p in self._procs:
+            p.start()
+        log_info(f"Started {len(self.cameras)} capture and {self.inference_workers} inference processes")
+
+    def results(self, timeout=0.5):
+        """
+        Yields result dicts until stop(); detections can be rebuilt with Detections(data, labels, fresh).
+        wait_s (capture -> a worker picks the frame up) and compute_s (detector time) are also
+        recorded as the queue_wait / compute metrics stages per camera.
+        """
+        while not self._stop.is_set():
+            try:
+                result = self._results.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            metrics.observe("queue_wait", result["wait_s"], camera=result["camera"])
+            metrics.observe("compute", result["compute_s"], camera=result["camera"])
+            yield result
+
+    def latest_frame(self, name):
+        """Copy of the newest frame of a camera (for display), or None."""
+        ring = self._rings[name]
+        got = ring.acquire_latest(0)
+        if got is None:
+            return None
+        slot, _, _, view = got
+        try:
+            return view.copy()
+        finally:
+            ring.release(slot)
+
+    def stop(self):
+        self._stop.set()
+        for p in self._procs:
+            p.join(timeout=5.0)
+            if p.is_alive():
+                p.terminate()
+        self._procs = []
+        for ring in self._rings.values():
+            ring.close(unlink=True)
+        self._rings = {}
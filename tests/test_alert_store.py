@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+import aegis_utils  # noqa: E402
+from alert_store import AlertStore  # noqa: E402
+from detections import DETECTION_DTYPE, Detections  # noqa: E402
+
+DAY = 86400.0
+
+
+@pytest.fixture(autouse=True)
+def quiet_logs(tmp_path):
+    aegis_utils.configure_logging(log_dir=str(tmp_path / "logs"), console=False)
+    yield
+    aegis_utils.event_log.shutdown()
+
+
+def dets(label="person", conf=0.8):
+    data = np.zeros(1, dtype=DETECTION_DTYPE)
+    data["box"] = (10, 20, 110, 220)
+    data["conf"] = conf
+    return Detections(data, np.array([label], dtype=object))
+
+
+def clip(store, name, size=1000):
+    path = store.path_for(name, "mp4")
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+def test_record_query_and_thumbnail(tmp_path):
+    store = AlertStore(str(tmp_path / "alerts"))
+    now = time.time()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    store.record("a", "gate", now - 5, now, dets("person", 0.9), clip(store, "a"), frame=frame, track_ids=[7])
+    store.record("b", "lobby", now - 3, now, dets("dog", 0.4), clip(store, "b"))
+    store.close()
+
+    assert [r["name"] for r in store.query()] == ["b", "a"]  # newest first
+    assert [r["name"] for r in store.query(camera="gate")] == ["a"]
+    assert [r["name"] for r in store.query(label="dog")] == ["b"]
+    assert [r["name"] for r in store.query(min_conf=0.5)] == ["a"]
+    assert store.query(end=now - 10) == []
+    alert = store.query(camera="gate")[0]
+    assert alert["bytes"] == 1000
+    assert store.detections(alert["id"]) == [{"label": "person", "conf": pytest.approx(0.9),
+                                              "box": [10, 20, 110, 220], "track_id": 7}]
+    assert store.thumbnail(alert["id"])[:2] == b"\xff\xd8"  # JPEG
+    assert store.thumbnail(store.query(camera="lobby")[0]["id"]) is None
+
+
+def test_inserts_are_batched(tmp_path):
+    store = AlertStore(str(tmp_path / "alerts"), batch_size=4)
+    batches, gate = [], threading.Event()
+    insert = store._insert
+
+    def held_insert(conn, batch):
+        gate.wait(5.0)  # hold the writer until every record is queued
+        batches.append(len(batch))
+        insert(conn, batch)
+
+    store._insert = held_insert
+    now = time.time()
+    for i in range(10):
+        store.record(f"alert{i}", "gate", now + i, now + i + 1, dets(), None)
+    gate.set()
+    store.close()
+    assert sum(batches) == 10 and store.recorded == 10
+    assert max(batches) == 4 and len(batches) <= 4
+    assert len(store.query(limit=100)) == 10
+
+
+def test_retention_removes_old_alerts_and_files(tmp_path):
+    store = AlertStore(str(tmp_path / "alerts"), retention_days=1)
+    now = time.time()
+    old, new = clip(store, "old"), clip(store, "new")
+    store.record("old", "gate", now - 3 * DAY, now - 3 * DAY + 5, dets(), old)
+    store.record("new", "gate", now - 60, now, dets(), new)
+    store.close()
+    assert [r["name"] for r in store.query()] == ["new"]
+    assert not os.path.exists(old) and os.path.exists(new)
+    assert store.evicted == 1
+
+
+def test_size_cap_evicts_oldest_first(tmp_path):
+    store = AlertStore(str(tmp_path / "alerts"), max_bytes=2500)
+    now = time.time()
+    paths = {}
+    for i, name in enumerate(("first", "second", "third")):
+        paths[name] = clip(store, name, size=1000)
+        store.record(name, "gate", now + i, now + i + 1, dets(), paths[name])
+    store.close()
+    assert [r["name"] for r in store.query()] == ["third", "second"]
+    assert not os.path.exists(paths["first"])
+    assert os.path.exists(paths["second"]) and os.path.exists(paths["third"])
+    assert store.stats()["evicted"] == 1
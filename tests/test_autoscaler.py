@@ -0,0 +1,90 @@
+import pytest
+
+pytest.importorskip("cv2")  # aegis_utils (logging) imports OpenCV
+
+import aegis_utils  # noqa: E402
+from autoscaler import LatencyAutoscaler, default_ladder  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def quiet_logs(tmp_path):
+    aegis_utils.configure_logging(log_dir=str(tmp_path), console=False)
+    yield
+    aegis_utils.event_log.shutdown()
+
+
+def make(**kwargs):
+    # alpha=1: the smoothed latency is the last sample, so each step is easy to follow
+    # budget is 100 ms: down above 110 ms, up only when the larger size is predicted below 75 ms
+    options = dict(target_fps=10, sizes=[640, 480, 320], alpha=1.0, patience=3, cooldown=2)
+    options.update(kwargs)
+    return LatencyAutoscaler(**options)
+
+
+def feed(scaler, seconds, n):
+    for _ in range(n):
+        scaler.observe(seconds)
+
+
+def test_steps_down_only_after_cooldown_and_patience():
+    s = make()
+    feed(s, 0.2, 4)  # 2 samples of initial cooldown, then 2 of the 3 needed
+    assert s.level == 0
+    s.observe(0.2)
+    assert (s.imgsz, s.stride, s.changes) == (480, 1, 1)
+
+
+def test_within_down_margin_holds_size():
+    s = make()
+    feed(s, 0.105, 50)  # over budget, but inside the 10% down margin
+    assert s.level == 0 and s.changes == 0
+
+
+def test_patience_resets_when_condition_breaks():
+    s = make()
+    feed(s, 0.2, 4)
+    s.observe(0.08)  # one on-budget sample resets the count
+    feed(s, 0.2, 2)
+    assert s.level == 0
+    s.observe(0.2)
+    assert s.level == 1
+
+
+def test_cooldown_after_a_change():
+    s = make()
+    feed(s, 0.2, 5)
+    assert s.level == 1
+    # first sample at the new size is ignored, the next is cooldown, then patience again
+    feed(s, 0.3, 4)
+    assert s.level == 1
+    s.observe(0.3)
+    assert s.level == 2 and s.changes == 2
+
+
+def test_steps_up_only_with_headroom():
+    s = make()
+    feed(s, 0.2, 5)
+    assert s.imgsz == 480
+    # 50 ms at 480 predicts ~89 ms at 640: fits the budget but not the up margin
+    feed(s, 0.05, 50)
+    assert s.imgsz == 480
+    # 40 ms predicts ~71 ms at 640
+    feed(s, 0.04, 2)
+    assert s.imgsz == 480
+    s.observe(0.04)
+    assert s.imgsz == 640 and s.changes == 2
+
+
+def test_strides_follow_the_smallest_size():
+    s = make(sizes=[320], strides=(2,))
+    assert s.ladder == [(320, 1), (320, 2)]
+    feed(s, 0.2, 5)
+    assert (s.imgsz, s.stride) == (320, 2)
+    assert [s.due() for _ in range(4)] == [True, False, True, False]
+    assert s.status()["stride"] == 2
+
+
+def test_default_ladder_and_configure():
+    assert default_ladder(640) == [640, 512, 416, 320, 256]
+    s = LatencyAutoscaler(target_fps=5).configure(640, camera="gate")
+    assert s.camera == "gate" and s.imgsz == 640 and len(s.ladder) == 5
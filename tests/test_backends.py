@@ -0,0 +1,44 @@
+import shutil
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("ultralytics")
+
+import backends  # noqa: E402
+
+REQUIRES = {"onnx": "onnxruntime", "openvino": "openvino"}
+
+
+@pytest.fixture(scope="module")
+def small_model(tmp_path_factory):
+    """yolov8n weights in a temp dir, so exports are cached there and not next to the repo."""
+    from ultralytics import YOLO
+    from ultralytics.utils import ASSETS
+    root = tmp_path_factory.mktemp("weights")
+    try:
+        model = YOLO("yolov8n.pt")
+    except Exception as e:  # no cached weights and no network
+        pytest.skip(f"yolov8n.pt unavailable: {e}")
+    path = root / "yolov8n.pt"
+    shutil.copy(model.ckpt_path, path)
+    return str(path), ASSETS
+
+
+def _frames(assets):
+    import cv2
+    frames = [cv2.imread(str(p)) for p in sorted(assets.glob("*.jpg"))]
+    frames = [f for f in frames if f is not None]
+    rng = np.random.default_rng(0)
+    frames.append(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8))  # no detections expected
+    return frames
+
+
+@pytest.mark.parametrize("backend", sorted(REQUIRES))
+def test_exported_backend_matches_torch(small_model, backend):
+    pytest.importorskip(REQUIRES[backend])
+    path, assets = small_model
+    ok, report = backends.check_parity(path, backend, _frames(assets), imgsz=320)
+    assert report["frames"] >= 1
+    assert ok, report
@@ -0,0 +1,61 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from cadence import CadenceScheduler, ModelCadence  # noqa: E402
+from detections import DETECTION_DTYPE, Detections  # noqa: E402
+
+
+def dets(n=1):
+    data = np.zeros(n, dtype=DETECTION_DTYPE)
+    data["conf"] = 0.9
+    return Detections(data, np.array(["fire"] * n, dtype=object))
+
+
+def run(sched, name, frames, found=lambda i: Detections()):
+    """Ticks `frames` frames; returns the frame indices on which `name` ran."""
+    ran = []
+    for _ in range(frames):
+        i = sched.tick()
+        if sched.due(name):
+            sched.update(name, found(i))
+            ran.append(i)
+    return ran
+
+
+def test_stride_runs_every_nth_frame():
+    sched = CadenceScheduler({"fire": ModelCadence(stride=3)})
+    assert run(sched, "fire", 10) == [0, 3, 6, 9]
+    assert sched.status()["fire"]["runs"] == 4
+
+
+def test_hz_cadence_uses_elapsed_time():
+    sched = CadenceScheduler({"fire": ModelCadence(hz=2)})
+    sched.tick()
+    assert sched.due("fire", now=0.0)
+    sched.update("fire", Detections(), now=0.0)
+    sched.tick()
+    assert not sched.due("fire", now=0.4)
+    assert sched.due("fire", now=0.5)
+
+
+def test_detection_boosts_cadence_until_boost_frames_pass():
+    sched = CadenceScheduler({"fire": ModelCadence(stride=4, boost_stride=1, boost_frames=3)})
+    # detects only on frame 0: dense runs for 3 frames, then back to every 4th
+    ran = run(sched, "fire", 12, found=lambda i: dets() if i == 0 else Detections())
+    assert ran == [0, 1, 2, 3, 7, 11]
+    assert not sched.status()["fire"]["boosted"]
+
+
+def test_carry_returns_last_detections_flagged_stale():
+    sched = CadenceScheduler({"fire": ModelCadence(stride=2), "smoke": ModelCadence(stride=2, carry=False)})
+    sched.tick()
+    sched.update("fire", dets(2))
+    sched.update("smoke", dets(2))
+    assert sched.detections("fire").fresh.all()
+    sched.tick()
+    carried = sched.detections("fire")
+    assert len(carried) == 2 and not carried.fresh.any()
+    assert len(sched.detections("smoke")) == 0
+    status = sched.status()["fire"]
+    assert not status["fresh"] and status["age_frames"] == 1
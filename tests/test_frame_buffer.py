@@ -0,0 +1,66 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from frame_buffer import FrameRingBuffer  # noqa: E402
+
+
+def frame(value, shape=(4, 6, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def values(frames):
+    return [int(f[0, 0, 0]) for f in frames]
+
+
+def test_wraparound_keeps_oldest_to_newest_order():
+    buf = FrameRingBuffer(3)
+    for v in range(5):
+        buf.push(frame(v))
+    assert len(buf) == 3
+    assert values(buf.views()) == [2, 3, 4]
+    assert values(buf.snapshot()) == [2, 3, 4]
+    assert int(buf.latest()[0, 0, 0]) == 4
+
+
+def test_partial_fill_and_clear():
+    buf = FrameRingBuffer(4)
+    assert buf.latest() is None and buf.snapshot().shape == (0,)
+    buf.push(frame(7))
+    buf.push(frame(8))
+    assert values(buf.views()) == [7, 8]
+    buf.clear()
+    assert len(buf) == 0 and buf.views() == []
+
+
+def test_snapshot_and_handoff_survive_later_pushes():
+    buf = FrameRingBuffer(2)
+    buf.push(frame(1))
+    buf.push(frame(2))
+    snap = buf.snapshot()
+    handed = buf.handoff()
+    views = buf.views()
+    for v in (3, 4):
+        buf.push(frame(v))
+    assert values(snap) == [1, 2]
+    assert values(handed) == [1, 2]
+    assert values(views) == [3, 4]  # views alias the ring and see the overwrite
+
+
+def test_resolution_change_restarts_the_ring():
+    buf = FrameRingBuffer(3)
+    buf.push(frame(1))
+    buf.push(frame(2, shape=(8, 8, 3)))
+    assert len(buf) == 1 and buf.snapshot().shape == (1, 8, 8, 3)
+
+
+def test_jpeg_handoff_keeps_encoded_buffers():
+    buf = FrameRingBuffer(2, jpeg_quality=90)
+    buf.push(frame(50, (16, 16, 3)))
+    buf.push(frame(100, (16, 16, 3)))
+    handed = buf.handoff()
+    buf.push(frame(200, (16, 16, 3)))
+    decoded = [cv2.imdecode(b, cv2.IMREAD_COLOR) for b in handed]
+    np.testing.assert_allclose(values(decoded), [50, 100], atol=2)
+    np.testing.assert_allclose(values(buf.views()), [100, 200], atol=2)
@@ -0,0 +1,51 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("torch")
+pytest.importorskip("ultralytics")
+
+from detections import box_iou  # noqa: E402
+from public_security import PublicSecurity  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def frames_and_weights():
+    from ultralytics import YOLO
+    from ultralytics.utils import ASSETS
+    try:
+        path = YOLO("yolov8n.pt").ckpt_path
+    except Exception as e:  # no cached weights and no network
+        pytest.skip(f"yolov8n.pt unavailable: {e}")
+    frames = [cv2.imread(str(p)) for p in sorted(ASSETS.glob("*.jpg"))]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        pytest.skip("no sample images")
+    return frames, path
+
+
+def _assert_same(ref, alt):
+    assert len(ref) == len(alt)
+    if not len(ref):
+        return
+    iou = box_iou(ref.boxes, alt.boxes)
+    best = iou.argmax(axis=1)
+    assert (iou[np.arange(len(ref)), best] >= 0.9).all()
+    assert (ref.cls == alt.cls[best]).all()
+    assert np.abs(ref.confs - alt.confs[best]).max() <= 0.02
+
+
+@pytest.mark.parametrize("imgsz", [640, 416])
+def test_shared_preprocess_matches_predict(frames_and_weights, imgsz):
+    frames, path = frames_and_weights
+    ref = PublicSecurity(path, path, imgsz=imgsz, parallel=False, shared_preprocess=False)
+    alt = PublicSecurity(path, path, imgsz=imgsz, parallel=False, shared_preprocess=True)
+    assert alt.shared is not None
+    try:
+        for frame in frames:
+            _assert_same(ref.infer_frame(frame)[1], alt.infer_frame(frame)[1])
+        for (_, ref_dets), (_, alt_dets) in zip(ref.infer_batch(frames[:1] * 2), alt.infer_batch(frames[:1] * 2)):
+            _assert_same(ref_dets, alt_dets)
+    finally:
+        ref.close()
+        alt.close()
@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from detections import DETECTION_DTYPE, Detections  # noqa: E402
+from roi import RoiConfig, nms  # noqa: E402
+
+SHAPE = (1000, 1600, 3)
+
+
+def dets(*rows):
+    """rows: (box, conf, cls) in crop pixels."""
+    data = np.zeros(len(rows), dtype=DETECTION_DTYPE)
+    for i, (box, conf, cls) in enumerate(rows):
+        data[i] = (box, conf, cls)
+    return Detections(data, np.array([f"c{r[2]}" for r in rows], dtype=object))
+
+
+def test_tiles_cover_the_frame_with_overlap():
+    roi = RoiConfig(tile=640, overlap=0.2)
+    assert roi.crops(SHAPE) == [(x, y, x + 640, y + 640) for y in (0, 360) for x in (0, 512, 960)]
+    assert [c.shape[:2] for c in roi.cut(np.zeros(SHAPE, np.uint8))] == [(640, 640)] * 6
+
+
+def test_merge_shifts_crop_detections_to_frame_coordinates():
+    roi = RoiConfig(tile=640, overlap=0.2)
+    per_crop = [Detections() for _ in roi.crops(SHAPE)]
+    per_crop[1] = dets(((10, 10, 50, 50), 0.9, 0))    # crop origin (512, 0)
+    per_crop[5] = dets(((100, 40, 140, 80), 0.8, 1))  # crop origin (960, 360)
+    merged = roi.merge(per_crop, SHAPE)
+    assert sorted(merged.boxes.tolist()) == [[522, 10, 562, 50], [1060, 400, 1100, 440]]
+
+
+def test_merge_suppresses_duplicates_across_tile_seams():
+    roi = RoiConfig(tile=640, overlap=0.2)
+    per_crop = [Detections() for _ in roi.crops(SHAPE)]
+    # one object on the seam between crop 0 (x0=0) and crop 1 (x0=512): frame box (520, 10, 600, 50)
+    per_crop[0] = dets(((520, 10, 600, 50), 0.9, 0))
+    per_crop[1] = dets(((8, 10, 88, 50), 0.6, 0), ((8, 10, 88, 50), 0.7, 1))  # same place, another class
+    merged = roi.merge(per_crop, SHAPE)
+    assert len(merged) == 2
+    kept = {int(c): float(s) for c, s in zip(merged.cls, merged.confs)}
+    assert kept == {0: pytest.approx(0.9), 1: pytest.approx(0.7)}
+
+
+def test_merge_drops_detections_outside_the_polygon():
+    roi = RoiConfig(polygons=[[(0, 0), (600, 0), (600, 600), (0, 600)]], tile=640)
+    assert roi.crops(SHAPE) == [(0, 0, 640, 640)]
+    merged = roi.merge([dets(((100, 100, 200, 200), 0.9, 0), ((605, 0, 640, 40), 0.9, 0))], SHAPE)
+    assert merged.boxes.tolist() == [[100, 100, 200, 200]]
+
+
+def test_merge_of_nothing_is_empty():
+    roi = RoiConfig(polygons=[[(0, 0), (10, 0), (10, 10)]], tile=640)
+    assert len(roi.merge([], SHAPE)) == 0
+
+
+def test_nms_is_per_class_and_ordered_by_score():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10], [50, 50, 60, 60]], dtype=np.float32)
+    scores = np.array([0.5, 0.9, 0.8, 0.7], dtype=np.float32)
+    classes = np.array([0, 0, 1, 0])
+    assert nms(boxes, scores, classes, 0.5).tolist() == [1, 2, 3]
@@ -0,0 +1,82 @@
+import multiprocessing as mp
+import uuid
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from shm_transport import FREE, READING, READY, WRITING, CameraRing  # noqa: E402
+
+
+@pytest.fixture
+def ring():
+    r = CameraRing(f"aegis_test_{uuid.uuid4().hex[:8]}", (2, 3, 3), slots=3, lock=mp.Lock(), create=True)
+    yield r
+    r.close(unlink=True)
+
+
+def states(ring):
+    return [int(ring.meta[2 + s]) for s in range(ring.slots)]
+
+
+def write(ring, value, stamp):
+    slot, view = ring.begin_write()
+    assert slot is not None
+    view[:] = value
+    ring.commit(slot, stamp)
+    return slot
+
+
+def test_empty_ring_has_nothing_to_read(ring):
+    assert ring.peek() is None and ring.acquire_latest() is None
+    slot, _ = ring.begin_write()
+    assert states(ring)[slot] == WRITING
+    assert ring.acquire_latest() is None  # a slot being written is never handed out
+
+
+def test_latest_frame_wins_and_superseded_slot_is_freed(ring):
+    first = write(ring, 1, 10.0)
+    assert states(ring)[first] == READY
+    second = write(ring, 2, 11.0)
+    assert second != first and states(ring)[first] == FREE
+    assert ring.peek() == 11.0
+    slot, seq, stamp, view = ring.acquire_latest()
+    assert (slot, seq, stamp, int(view[0, 0, 0])) == (second, 2, 11.0, 2)
+    assert states(ring)[slot] == READING
+    assert ring.acquire_latest(after_seq=seq) is None  # already served
+    ring.release(slot)
+    assert states(ring)[slot] == READY  # still the newest frame
+
+
+def test_writer_never_claims_the_slot_being_read(ring):
+    write(ring, 1, 1.0)
+    reading, seq, _, view = ring.acquire_latest()
+    for value in range(2, 8):
+        slot = write(ring, value, float(value))
+        assert slot != reading
+    assert int(view[0, 0, 0]) == 1  # the reader's frame is untouched
+    ring.release(reading)
+    assert states(ring)[reading] == FREE  # newer frames exist: the slot is reusable
+    slot, newest, _, view = ring.acquire_latest(after_seq=seq)
+    assert newest == 7 and int(view[0, 0, 0]) == 7
+
+
+def test_begin_write_gives_up_when_every_slot_is_busy(ring):
+    write(ring, 1, 1.0)
+    ring.acquire_latest()
+    ring.begin_write()
+    ring.begin_write()
+    assert ring.begin_write() == (None, None)
+    assert sorted(states(ring)) == [WRITING, WRITING, READING]
+
+
+def test_attach_shares_bookkeeping_and_frames(ring):
+    write(ring, 5, 2.0)
+    other = CameraRing.attach(ring.spec())
+    try:
+        slot, seq, stamp, view = other.acquire_latest()
+        assert (seq, stamp, int(view[0, 0, 0])) == (1, 2.0, 5)
+        assert states(ring)[slot] == READING
+        other.release(slot)
+    finally:
+        other.close()
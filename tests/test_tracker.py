@@ -0,0 +1,72 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from detections import DETECTION_DTYPE, Detections  # noqa: E402
+from tracker import IouTracker  # noqa: E402
+
+
+def dets(*boxes, cls=0, label="person"):
+    data = np.zeros(len(boxes), dtype=DETECTION_DTYPE)
+    if boxes:
+        data["box"] = boxes
+        data["conf"] = 0.9
+        data["cls"] = cls
+    return Detections(data, np.array([label] * len(boxes), dtype=object))
+
+
+def test_track_confirms_once_after_min_hits():
+    tracker = IouTracker(min_hits=3)
+    ids, confirmed = tracker.update(dets((10, 10, 50, 50)))
+    assert confirmed == [] and tracker.tentative
+    track_id = int(ids[0])
+    ids, confirmed = tracker.update(dets((12, 10, 52, 50)))
+    assert int(ids[0]) == track_id and confirmed == []
+    ids, confirmed = tracker.update(dets((14, 10, 54, 50)))
+    assert confirmed == [track_id] and not tracker.tentative
+    # already confirmed: never reported again
+    _, confirmed = tracker.update(dets((16, 10, 56, 50)))
+    assert confirmed == []
+
+
+def test_separate_objects_and_classes_get_separate_tracks():
+    tracker = IouTracker()
+    ids, _ = tracker.update(dets((0, 0, 40, 40), (200, 200, 240, 240)))
+    assert len(set(ids.tolist())) == 2
+    ids2, _ = tracker.update(dets((0, 0, 40, 40), cls=1, label="dog"))
+    assert int(ids2[0]) not in ids.tolist()  # class-aware: a dog is not the person's track
+
+
+def test_coast_moves_tracks_along_velocity_without_ageing():
+    tracker = IouTracker(min_hits=1, max_gap=1)
+    tracker.update(dets((0, 0, 40, 40)))
+    tracker.update(dets((10, 0, 50, 40)))
+    velocity = tracker.velocity[0].copy()
+    box = tracker.boxes[0].copy()
+    for _ in range(5):
+        tracker.coast()
+    np.testing.assert_allclose(tracker.boxes[0], box + 5 * velocity)
+    assert tracker.misses[0] == 0 and len(tracker) == 1
+
+
+def test_coasted_track_is_rematched_after_fast_motion():
+    tracker = IouTracker(min_hits=1)
+    ids, _ = tracker.update(dets((0, 0, 40, 40)))
+    tracker.update(dets((20, 0, 60, 40)))
+    tracker.coast()  # model skipped a frame while the object kept moving
+    ids3, confirmed = tracker.update(dets((50, 0, 90, 40)))  # too far from where the track was last seen
+    assert int(ids3[0]) == int(ids[0]) and confirmed == []
+
+
+def test_track_survives_gap_then_is_dropped():
+    tracker = IouTracker(min_hits=1, max_gap=2)
+    ids, _ = tracker.update(dets((0, 0, 40, 40)))
+    tracker.update(dets())
+    tracker.update(dets())
+    ids2, confirmed = tracker.update(dets((0, 0, 40, 40)))
+    assert int(ids2[0]) == int(ids[0]) and confirmed == []  # within the gap: same id, no new alert
+    for _ in range(3):
+        tracker.update(dets())
+    assert len(tracker) == 0
+    ids3, confirmed = tracker.update(dets((0, 0, 40, 40)))
+    assert int(ids3[0]) != int(ids[0]) and confirmed == [int(ids3[0])]
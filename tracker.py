@@ -0,0 +1,140 @@
+# tracker.py
+"""
+Persistent object identities for the home trigger.
+
+Instead of counting consecutive frames with *any* detection, detections are
+associated with tracks across frames. A track alerts once, when it has been
+matched min_hits times; a person standing still for a minute is one alert,
+and brief misses (occlusion, a low-confidence frame) do not reset it. On
+frames the motion gate skips, tracks coast along their last velocity, so the
+model does not need to run every frame to keep identities.
+"""
+import numpy as np
+
+from detections import box_iou
+
+
+class IouTracker:
+    """
+    Lightweight multi-object tracker: greedy IoU matching with a centroid
+    fallback, constant-velocity coasting and gap tolerance. All state lives in
+    NumPy arrays, one row per live track.
+    - iou_threshold: minimum IoU to associate a detection with a track
+    - centroid_factor: if IoU is too low, still match when centre distance is below
+      this fraction of the track's box diagonal (fast motion / low frame rate)
+    - max_gap: inferred frames a track may go unmatched before it is dropped
+    - min_hits: matched frames needed before a track is confirmed (and alerts once)
+    - class_aware: only match detections of the same class
+    """
+
+    def __init__(self, iou_threshold=0.3, centroid_factor=0.5, max_gap=15, min_hits=3, class_aware=True):
+        self.iou_threshold = iou_threshold
+        self.centroid_factor = centroid_factor
+        self.max_gap = max_gap
+        self.min_hits = min_hits
+        self.class_aware = class_aware
+        self._next_id = 1
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.cls = np.zeros(0, dtype=np.int32)
+        self.labels = np.zeros(0, dtype=object)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.misses = np.zeros(0, dtype=np.int32)
+        self.confirmed = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def tentative(self):
+        """True while some track still needs evidence before it can be confirmed."""
+        return bool(len(self.ids)) and not self.confirmed.all()
+
+    def coast(self):
+        """Frame without inference: move tracks along their velocity; nothing is aged or dropped."""
+        self.boxes += self.velocity
+
+    def _match(self, det_boxes, det_cls):
+        """Greedy association -> (track_idx, det_idx) arrays."""
+        if not len(self.ids) or not len(det_boxes):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        iou = box_iou(self.boxes, det_boxes)
+        score = np.where(iou >= self.iou_threshold, iou, 0.0)
+        if self.centroid_factor:
+            tc = (self.boxes[:, :2] + self.boxes[:, 2:]) / 2.0
+            dc = (det_boxes[:, :2] + det_boxes[:, 2:]) / 2.0
+            dist = np.linalg.norm(tc[:, None, :] - dc[None, :, :], axis=2)
+            diag = np.linalg.norm(self.boxes[:, 2:] - self.boxes[:, :2], axis=1)[:, None]
+            near = dist < self.centroid_factor * np.maximum(diag, 1.0)
+            # centroid matches rank below any IoU match
+            score = np.where((score == 0) & near, 1e-3 * (1.0 - dist / np.maximum(diag, 1.0)), score)
+        if self.class_aware:
+            score = np.where(self.cls[:, None] == det_cls[None, :], score, 0.0)
+        rows, cols = [], []
+        score = score.copy()
+        while True:
+            t, d = np.unravel_index(np.argmax(score), score.shape)
+            if score[t, d] <= 0:
+                break
+            rows.append(t)
+            cols.append(d)
+            score[t, :] = 0
+            score[:, d] = 0
+        return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+    def update(self, detections):
+        """
+        Inferred frame: associates detections with tracks.
+        Returns (track_ids aligned with detections, ids of tracks confirmed on this frame).
+        """
+        det_boxes = detections.boxes.astype(np.float32) if len(detections) else np.zeros((0, 4), np.float32)
+        det_cls = detections.cls.astype(np.int32) if len(detections) else np.zeros(0, np.int32)
+        t_idx, d_idx = self._match(det_boxes, det_cls)
+
+        # matched tracks: refresh box, smooth velocity, count the hit
+        new_boxes = det_boxes[d_idx]
+        self.velocity[t_idx] = 0.5 * self.velocity[t_idx] + 0.5 * (new_boxes - self.boxes[t_idx])
+        self.boxes[t_idx] = new_boxes
+        self.hits[t_idx] += 1
+        self.misses[t_idx] = 0
+        unmatched_tracks = np.ones(len(self.ids), dtype=bool)
+        unmatched_tracks[t_idx] = False
+        self.misses[unmatched_tracks] += 1
+        self.boxes[unmatched_tracks] += self.velocity[unmatched_tracks]
+
+        det_ids = np.zeros(len(det_boxes), dtype=np.int64)
+        det_ids[d_idx] = self.ids[t_idx]
+
+        # unmatched detections start tentative tracks
+        unmatched_dets = np.ones(len(det_boxes), dtype=bool)
+        unmatched_dets[d_idx] = False
+        n_new = int(unmatched_dets.sum())
+        if n_new:
+            new_ids = np.arange(self._next_id, self._next_id + n_new, dtype=np.int64)
+            self._next_id += n_new
+            det_ids[unmatched_dets] = new_ids
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, det_boxes[unmatched_dets]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((n_new, 4), np.float32)])
+            self.cls = np.concatenate([self.cls, det_cls[unmatched_dets]])
+            self.labels = np.concatenate([self.labels, detections.labels[unmatched_dets]])
+            self.hits = np.concatenate([self.hits, np.ones(n_new, np.int32)])
+            self.misses = np.concatenate([self.misses, np.zeros(n_new, np.int32)])
+            self.confirmed = np.concatenate([self.confirmed, np.zeros(n_new, bool)])
+
+        # confirm tracks with enough evidence; each one is reported exactly once
+        newly = (~self.confirmed) & (self.hits >= self.min_hits)
+        self.confirmed |= newly
+        confirmed_ids = self.ids[newly].tolist()
+
+        # drop tracks unseen for too long
+        alive = self.misses <= self.max_gap
+        if not alive.all():
+            for name in ("ids", "boxes", "velocity", "cls", "labels", "hits", "misses", "confirmed"):
+                setattr(self, name, getattr(self, name)[alive])
+        return det_ids, confirmed_ids
+
+    def tracks(self):
+        return [{"id": int(i), "label": lbl, "box": b.astype(int).tolist(), "hits": int(h), "confirmed": bool(c)}
+                for i, lbl, b, h, c in zip(self.ids, self.labels, self.boxes, self.hits, self.confirmed)]